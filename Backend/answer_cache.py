@@ -0,0 +1,145 @@
+"""
+answer_cache.py — Similarity cache for repeated chat questions
+
+Users often open a conversation with (nearly) the same question, e.g. "Give me an
+overview of my activity today". This module stores the answers to such opening
+questions in the `chat_answer_cache` table of fitness.db and serves them again
+when a new question is similar enough:
+
+- Entries are scoped to a user, the date the chat assumes as "today" and a hash
+  of the user's data (see `response_cache.data_fingerprint`), so changed data never
+  returns a stale answer
+- Questions are normalized (case, punctuation, filler words) and compared with
+  `difflib`. Numbers, time words, metrics and polarity words must match exactly,
+  so "today" never matches "yesterday", "step goal" never matches "sleep goal"
+  and "max heart rate" never matches "min heart rate"
+- Entries expire after `ANSWER_TTL_SECONDS`, at most `MAX_ANSWERS_PER_USER` are kept per user,
+  and writes to a user's goals or weight call `invalidate_user_answers`
+
+All functions take a pooled connection as first argument, so they can be awaited through `database.run_db`.
+"""
+
+import re
+import time
+from difflib import SequenceMatcher
+from response_cache import data_fingerprint
+
+# Minimum similarity (0-1) between two normalized questions to reuse an answer
+SIMILARITY_THRESHOLD = 0.88
+
+# Time-to-live of a cached answer
+ANSWER_TTL_SECONDS = 24 * 60 * 60
+
+# Maximum number of cached answers per user
+MAX_ANSWERS_PER_USER = 200
+
+# Words that do not change the meaning of a question
+FILLER_WORDS = {"please", "can", "could", "would", "you", "me", "the", "a", "an", "of", "about", "tell", "give", "show"}
+
+# Words that must match exactly, because they select different data
+TIME_WORDS = {
+    "today", "yesterday", "tonight", "tomorrow", "night", "morning", "evening",
+    "day", "days", "week", "weeks", "weekly", "month", "months", "last", "this", "previous", "past",
+}
+
+# Words naming a metric or a direction, mapped to the concept that must match exactly;
+# synonyms share a concept, so "step" and "steps" still match each other
+CONCEPT_WORDS = {
+    "steps": {"step", "steps", "walk", "walked", "walking"},
+    "sleep": {"sleep", "slept", "sleeping", "asleep", "bed", "bedtime", "rest", "rested", "tired"},
+    "heart_rate": {"heart", "heartrate", "hr", "bpm", "pulse"},
+    "resting": {"resting"},
+    "calories": {"calorie", "calories", "kcal", "burn", "burned", "burnt"},
+    "weight": {"weight", "kg", "kilo", "kilos", "bmi"},
+    "active": {"active", "activity", "activities", "exercise", "workout"},
+    "sedentary": {"inactive", "inactivity", "sedentary", "sitting", "sat"},
+    "distance": {"distance", "km", "kilometers", "miles"},
+    "goal": {"goal", "goals", "target"},
+    "min": {"min", "minimum", "lowest", "least"},
+    "max": {"max", "maximum", "highest", "most", "peak"},
+    "average": {"average", "avg", "mean", "usual", "normal"},
+    "up": {"better", "improve", "improved", "more", "increase", "increased", "higher", "above"},
+    "down": {"worse", "less", "fewer", "decrease", "decreased", "drop", "dropped", "lower", "below"},
+    "negation": {"not", "no", "never", "dont", "didnt", "isnt", "wasnt", "cant"},
+}
+WORD_CONCEPTS = {word: concept for concept, words in CONCEPT_WORDS.items() for word in words}
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(question):
+    """Lowercase a question and keep its meaningful words, e.g. 'Can you tell me about my sleep?' -> 'my sleep'."""
+    words = WORD_PATTERN.findall(question.lower().replace("'", ""))
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def _selectors(normalized):
+    """The numbers, time words and metric/polarity concepts of a normalized question."""
+    selectors = set()
+    for word in normalized.split():
+        if word.isdigit() or word in TIME_WORDS:
+            selectors.add(word)
+        elif word in WORD_CONCEPTS:
+            selectors.add(WORD_CONCEPTS[word])
+    return selectors
+
+
+def lookup_answer(db, user_id, date, question):
+    """
+    Look up the cached answer to a question similar to `question`.
+
+    Returns:
+    --------
+    tuple
+        `(fingerprint, answer)`, where `answer` is None on a miss. The fingerprint is
+        passed to `store_answer` once the answer has been generated.
+    """
+    fingerprint = data_fingerprint(db, user_id, date)
+    normalized = normalize_question(question)
+    selectors = _selectors(normalized)
+
+    rows = db.execute(
+        "SELECT rowid, question, answer FROM chat_answer_cache "
+        "WHERE user_id = ? AND data_date = ? AND fingerprint = ? AND created_at > ?",
+        (str(user_id), date, fingerprint, time.time() - ANSWER_TTL_SECONDS)).fetchall()
+
+    best_row, best_ratio = None, SIMILARITY_THRESHOLD
+    for row in rows:
+        if _selectors(row["question"]) != selectors:
+            continue
+        matcher = SequenceMatcher(None, normalized, row["question"])
+        if matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best_row, best_ratio = row, ratio
+
+    if best_row is None:
+        return fingerprint, None
+
+    db.execute("UPDATE chat_answer_cache SET last_access = ? WHERE rowid = ?", (time.time(), best_row["rowid"]))
+    db.commit()
+    return fingerprint, best_row["answer"]
+
+
+def store_answer(db, user_id, date, fingerprint, question, answer):
+    """Store the answer to a question and evict expired and least recently used answers of the user."""
+    now = time.time()
+    db.execute(
+        "INSERT OR REPLACE INTO chat_answer_cache (user_id, data_date, fingerprint, question, answer, created_at, last_access) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (str(user_id), date, fingerprint, normalize_question(question), answer, now, now))
+    db.execute("DELETE FROM chat_answer_cache WHERE created_at <= ?", (now - ANSWER_TTL_SECONDS,))
+    db.execute(
+        "DELETE FROM chat_answer_cache WHERE rowid IN ("
+        "SELECT rowid FROM chat_answer_cache WHERE user_id = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+        (str(user_id), MAX_ANSWERS_PER_USER))
+    db.commit()
+
+
+def invalidate_user_answers(db, user_id):
+    """
+    Remove all cached answers of a user, e.g. after their goals or weight changed.
+    Does not commit: call it inside the transaction that changes the data.
+    """
+    db.execute("DELETE FROM chat_answer_cache WHERE user_id = ?", (str(user_id),))
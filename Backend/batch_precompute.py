@@ -0,0 +1,161 @@
+"""
+batch_precompute.py — Nightly precomputation of generated outputs
+
+When users open the app, it requests recommendations, suggested questions and a
+detail per metric at once, each running an LLM workflow. This job generates those
+outputs ahead of time for every user in `profiles` and stores them with
+`precomputed_outputs.store_output`, so the endpoints can answer from the table:
+
+- The existing `graph` workflow is run through a bounded pool (`--concurrency`)
+- Rate limits, timeouts and server errors are retried with exponential backoff,
+  honouring the API's `Retry-After` header
+- At the end it reports throughput (users/minute) and the tokens spent per model
+
+Usage:
+    python batch_precompute.py [--date YYYY-MM-DD] [--concurrency N] [--users ID ...]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date as date_type, timedelta
+import openai
+from langchain_core.callbacks import get_usage_metadata_callback
+from schema import migrate
+
+# Build or upgrade data/fitness.db before the chatbot module reads its schema
+migrate()
+
+from database import run_db
+from profiles import profiles
+from precomputed_outputs import store_output
+from chatbot_endpoints_sql import (
+    CHAT_DATE, default_detail_type, generate_detail, generate_recommendations, generate_suggested_questions,
+)
+
+# Metrics the app requests a detail for, with the day offset it requests them for (sleep is shown for last night)
+DETAIL_METRICS = [("steps", 0), ("calories", 0), ("active_minutes", 0), ("sleep", -1)]
+
+# Default number of workflows running at the same time
+DEFAULT_CONCURRENCY = 4
+
+# Retry policy for rate limits and transient API errors
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 60
+RETRYABLE_ERRORS = (
+    openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError,
+)
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: the API's Retry-After, or exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS) + random.uniform(0, 1)
+
+
+async def with_retry(generate):
+    """Await `generate()`, retrying retryable API errors up to `MAX_ATTEMPTS` times."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return await generate()
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"{type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt}/{MAX_ATTEMPTS})")
+            await asyncio.sleep(delay)
+
+
+def user_jobs(profile, date):
+    """
+    List the outputs to precompute for one user.
+
+    Returns:
+    --------
+    list
+        `(endpoint, variant, date, generate)` tuples, where `generate` is a coroutine function.
+    """
+    user_id = profile["id"]
+    jobs = [
+        ("recommendations", "", date, lambda: generate_recommendations(profile, user_id, date)),
+        ("suggested_questions", "", date, lambda: generate_suggested_questions(profile, user_id, date)),
+    ]
+    for metric, offset in DETAIL_METRICS:
+        metric_date = (date_type.fromisoformat(date) + timedelta(days=offset)).isoformat()
+        detail_type = default_detail_type(user_id, metric_date, metric)
+        jobs.append(("detail", f"{metric}:{detail_type}", metric_date,
+                     lambda metric=metric, metric_date=metric_date, detail_type=detail_type:
+                     generate_detail(profile, user_id, metric_date, metric, detail_type)))
+    return jobs
+
+
+async def precompute_user(profile, date, semaphore, stats):
+    """Generate and store all outputs of one user; each workflow holds a slot of the pool."""
+    async def run_job(endpoint, variant, job_date, generate):
+        async with semaphore:
+            try:
+                result = await with_retry(generate)
+            except Exception as e:
+                print(f"User {profile['id']}: {endpoint} {variant} failed: {e}")
+                result = None
+        if result:
+            await run_db(store_output, endpoint, profile["id"], job_date, variant, result, write=True)
+            stats["stored"] += 1
+        else:
+            stats["failed"] += 1
+
+    await asyncio.gather(*(run_job(*job) for job in user_jobs(profile, date)))
+
+
+async def run_batch(date, concurrency=DEFAULT_CONCURRENCY, user_ids=None):
+    """
+    Precompute the outputs of all users (or of `user_ids`) for `date`.
+
+    Returns:
+    --------
+    dict
+        Run statistics: users, stored and failed outputs, duration, users per minute and token usage per model.
+    """
+    users = [profile for profile in profiles.all() if user_ids is None or profile["id"] in user_ids]
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"stored": 0, "failed": 0}
+
+    start = time.perf_counter()
+    with get_usage_metadata_callback() as usage:
+        await asyncio.gather(*(precompute_user(profile, date, semaphore, stats) for profile in users))
+    seconds = time.perf_counter() - start
+
+    return {
+        "users": len(users),
+        "stored": stats["stored"],
+        "failed": stats["failed"],
+        "seconds": round(seconds, 1),
+        "users_per_minute": round(len(users) / seconds * 60, 1) if seconds else 0,
+        "tokens": usage.usage_metadata,
+    }
+
+
+def print_report(report):
+    """Print the run statistics."""
+    print(f"Precomputed {report['stored']} outputs for {report['users']} users "
+          f"in {report['seconds']}s ({report['users_per_minute']} users/minute), {report['failed']} failed")
+    for model, tokens in report["tokens"].items():
+        print(f"{model}: {tokens['input_tokens']} input + {tokens['output_tokens']} output = {tokens['total_tokens']} tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute recommendations, suggested questions and details for all users.")
+    parser.add_argument("--date", default=CHAT_DATE, help="Date in YYYY-MM-DD format")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Workflows running at the same time")
+    parser.add_argument("--users", nargs="*", help="Only precompute these user IDs")
+    args = parser.parse_args()
+
+    print_report(asyncio.run(run_batch(args.date, args.concurrency, args.users)))
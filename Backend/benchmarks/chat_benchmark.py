@@ -0,0 +1,101 @@
+"""
+chat_benchmark.py — Overhead of the chat pipeline without LLM latency
+
+Runs the chat pipeline offline against the `stub` LLM provider (or `replay`, with a
+recordings file) and reports the mean time per call of each layer:
+
+- `classify_question`: the local classifier fast path
+- `chat_graph` (general): history, classification, direct answer and formatting
+- `chat_graph` (data): the same with the agent loop, including one tool round-trip
+- `/chat/chat`: the endpoint, including persistence and the title in the background
+
+With `--latency-ms 0` the numbers are the overhead of the code around the LLM.
+`--profile` prints the functions with the highest cumulative time of the data path.
+
+Usage:
+    python benchmarks/chat_benchmark.py [--provider stub|replay] [--latency-ms 0] [--repeat 50] [--profile]
+"""
+
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from environment import USER_ID, prepare_environment
+
+GENERAL_QUESTION = "Can you give me some tips for a stretching routine?"
+DATA_QUESTION = "How many steps did I walk today?"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the chat pipeline's overhead against a local LLM backend.")
+    parser.add_argument("--provider", default="stub", choices=["stub", "replay"], help="LLM provider to run against")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Latency of every stub completion")
+    parser.add_argument("--repeat", type=int, default=50, help="Calls per measurement")
+    parser.add_argument("--profile", action="store_true", help="Profile the data path")
+    return parser.parse_args()
+
+
+async def mean_ms(call, repeat):
+    await call(0)  # Warm up
+    start = time.perf_counter()
+    for number in range(1, repeat + 1):
+        await call(number)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def run(repeat, profile):
+    import httpx
+    import chatbot_endpoints_sql as chatbot
+    from main import app
+
+    def state(message, number):
+        return chatbot.FitnessChatState(
+            message=message, user_message=message, conversation_id=f"benchmark_{number}", user_id=USER_ID)
+
+    async def classify(number):
+        await chatbot.classify_question(state(DATA_QUESTION, number))
+
+    async def general_graph(number):
+        await chatbot.chat_graph.ainvoke(state(GENERAL_QUESTION, number))
+
+    async def data_graph(number):
+        await chatbot.chat_graph.ainvoke(state(DATA_QUESTION, number))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async def endpoint(number):
+            # Follow-up questions skip the answer cache
+            response = await client.post("/chat/chat", json={
+                "user_id": USER_ID, "message": DATA_QUESTION, "conversation_id": f"benchmark_endpoint_{number}"})
+            response.raise_for_status()
+
+        results = {
+            "classify_question": await mean_ms(classify, repeat),
+            "chat_graph (general)": await mean_ms(general_graph, repeat),
+            "chat_graph (data, agent)": await mean_ms(data_graph, repeat),
+            "/chat/chat": await mean_ms(endpoint, repeat),
+        }
+
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for number in range(repeat):
+            await data_graph(number)
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    prepare_environment(llm_provider=args.provider, llm_latency_ms=args.latency_ms)
+
+    results = asyncio.run(run(args.repeat, args.profile))
+    print(f"{args.provider} provider, {args.latency_ms} ms latency, mean of {args.repeat} calls")
+    for name, ms in results.items():
+        print(f"  {name:<26} {ms:8.2f} ms")
@@ -0,0 +1,67 @@
+"""
+chat_load_test.py — Concurrency of the chat endpoint against the local LLM stub
+
+Runs `/chat/chat` requests with the `stub` LLM provider (see `llm_provider.py`), whose
+every completion takes `--latency-ms`. One request is timed on its own, then
+`--concurrency` requests are sent at once. If chats did not wait on each other,
+the concurrent batch takes about as long as a single chat; if they serialized,
+it would take `concurrency` times as long.
+
+The title of a new conversation is generated in a background task; the ASGI
+transport waits for it, so it is part of the measured time.
+
+Usage:
+    python benchmarks/chat_load_test.py [--latency-ms 200] [--concurrency 20] [--stream]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from environment import USER_ID, prepare_environment
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure whether concurrent chats run in parallel against the LLM stub.")
+    parser.add_argument("--latency-ms", type=int, default=200, help="Latency of every stub completion")
+    parser.add_argument("--concurrency", type=int, default=20, help="Chats sent at the same time")
+    parser.add_argument("--stream", action="store_true", help="Use /chat/chat/stream instead of /chat/chat")
+    return parser.parse_args()
+
+
+async def send_chat(client, path, number):
+    # Numbered questions never hit the answer cache, whose numbers must match exactly
+    response = await client.post(path, json={"user_id": USER_ID, "message": f"Give me {number} tips to sleep better"})
+    response.raise_for_status()
+
+
+async def run(path, concurrency):
+    """Return the seconds taken by one chat alone and by `concurrency` chats sent at once."""
+    import httpx
+    from main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=600) as client:
+        await send_chat(client, path, 0)  # Warm up
+
+        start = time.perf_counter()
+        await send_chat(client, path, 1)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send_chat(client, path, 100 + number) for number in range(concurrency)))
+        return single, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    prepare_environment(llm_latency_ms=args.latency_ms)
+
+    path = "/chat/chat/stream" if args.stream else "/chat/chat"
+    single, batch = asyncio.run(run(path, args.concurrency))
+    print(f"{path} with {args.latency_ms} ms stub latency")
+    print(f"  1 chat: {single:.2f}s")
+    print(f"  {args.concurrency} concurrent chats: {batch:.2f}s "
+          f"({batch / single:.1f}x a single chat; fully serialized would be {args.concurrency}x)")
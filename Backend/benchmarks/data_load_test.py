@@ -0,0 +1,81 @@
+"""
+data_load_test.py — Throughput of the data endpoints per number of database workers
+
+Sends a fixed number of concurrent requests to one `/data` route and reports the
+throughput for several pool sizes. For each run, the connection pool and the
+database executor (see `database.py`) are replaced with ones of the given size.
+Requests go through the ASGI app in-process, so no server or network is needed.
+
+`/data/{dataset_name}` returns every row of the user as JSON, so for large datasets
+most of the time is spent serializing in Python; a query-bound route such as the
+aggregated range shows the scaling of the pool more clearly.
+
+Usage:
+    python benchmarks/data_load_test.py [--path /data/daily_data?user_id=...] [--requests N]
+        [--concurrency N] [--workers 1 2 4 8]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from environment import USER_ID, prepare_environment
+
+prepare_environment()
+
+import httpx
+import database
+from database import ConnectionPool
+from main import app
+
+DEFAULT_PATHS = [
+    f"/data/daily_data?user_id={USER_ID}",
+    f"/data/heartrate_minutes/range?user_id={USER_ID}&start=2016-03-01&end=2016-04-30&aggregate=avg",
+]
+
+
+async def run_load(path, requests, concurrency):
+    """Send `requests` GET requests to `path`, at most `concurrency` at a time, and return the requests per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        await one()  # Warm up connections and caches
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def use_workers(workers):
+    """Replace the shared pool and executor with ones of `workers` connections and threads."""
+    database.pool.close()
+    database.executor.shutdown()
+    database.pool = ConnectionPool(size=workers)
+    database.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlite")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the throughput of a data endpoint per number of database workers.")
+    parser.add_argument("--path", action="append", help="Route to request (repeatable); defaults to a raw and an aggregated route")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at the same time")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8], help="Pool sizes to compare")
+    args = parser.parse_args()
+
+    for path in args.path or DEFAULT_PATHS:
+        print(path)
+        baseline = None
+        for workers in args.workers:
+            use_workers(workers)
+            throughput = asyncio.run(run_load(path, args.requests, args.concurrency))
+            baseline = baseline or throughput
+            print(f"  {workers} workers: {throughput:8.1f} requests/s ({throughput / baseline:.2f}x)")
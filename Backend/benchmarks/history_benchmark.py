@@ -0,0 +1,101 @@
+"""
+history_benchmark.py — Cost of conversation writes and reads versus history size
+
+Grows the conversation tables with synthetic messages of many users and, at each
+size, measures the mean time of:
+
+- `save_message`: storing one message (and appending it to the cached history)
+- `get_chat_history` on a cache miss: loading one conversation from the database
+- `/data/conversation_messages/{conversation_id}` and `/data/conversation_subjects/{user_id}`
+
+With the indexed tables these costs should stay flat as the total history grows.
+
+Usage:
+    python benchmarks/history_benchmark.py [--sizes 1000 10000 100000] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from environment import USER_ID, prepare_environment
+
+prepare_environment()
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from database import pool
+from data_endpoints import router as data_router
+from chatbot_endpoints_sql import get_chat_history, history_cache, save_message
+
+# Messages per synthetic conversation, and conversations per synthetic user
+MESSAGES_PER_CONVERSATION = 10
+CONVERSATIONS_PER_USER = 10
+
+app = FastAPI()
+app.include_router(data_router, prefix="/data")
+client = TestClient(app)
+
+
+def message_count():
+    with pool.connection() as connection:
+        return connection.execute("SELECT COUNT(*) FROM conversation_messages").fetchone()[0]
+
+
+def grow_history(size):
+    """Add synthetic conversations until the messages table holds `size` rows."""
+    start = message_count()
+    rows, subjects = [], []
+    for number in range(start, size):
+        conversation = number // MESSAGES_PER_CONVERSATION
+        user_id = f"9{conversation // CONVERSATIONS_PER_USER:09d}"
+        conversation_id = f"{user_id}_{conversation}"
+        rows.append((conversation_id, user_id, "user" if number % 2 == 0 else "assistant",
+                     f"Synthetic message {number}", "2016-04-14T10:00:00"))
+        if number % MESSAGES_PER_CONVERSATION == 0:
+            subjects.append((conversation_id, user_id, f"Conversation {conversation}", f"2016-04-14T10:{conversation % 60:02d}:00"))
+
+    with pool.connection(write=True) as connection:
+        connection.executemany(
+            "INSERT INTO conversation_messages (conversation_id, user_id, role, message, timestamp) VALUES (?, ?, ?, ?, ?)", rows)
+        connection.executemany(
+            "INSERT INTO conversation_subjects (conversation_id, user_id, subject, timestamp) VALUES (?, ?, ?, ?)", subjects)
+        connection.commit()
+
+
+def mean_ms(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def measure(size, repeat):
+    """Mean milliseconds of each write and read operation at the current history size."""
+    # A new conversation per size, so the measured conversation always holds `repeat` messages
+    conversation_id = f"{USER_ID}_benchmark_{size}"
+
+    def read_history():
+        history_cache.invalidate(conversation_id)
+        get_chat_history(conversation_id)
+
+    return {
+        "save_message": mean_ms(lambda: save_message(conversation_id, USER_ID, "user", "How did I sleep?"), repeat),
+        "history (cache miss)": mean_ms(read_history, repeat),
+        "messages route": mean_ms(lambda: client.get(f"/data/conversation_messages/{conversation_id}"), repeat),
+        "subjects route": mean_ms(lambda: client.get(f"/data/conversation_subjects/{USER_ID}"), repeat),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure conversation write and read cost versus history size.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000], help="Total messages to measure at")
+    parser.add_argument("--repeat", type=int, default=100, help="Repetitions per operation")
+    args = parser.parse_args()
+
+    for size in sorted(args.sizes):
+        grow_history(size)
+        results = measure(size, args.repeat)
+        print(f"{message_count():>8} messages: " + ", ".join(f"{name} {ms:.2f} ms" for name, ms in results.items()))
@@ -0,0 +1,110 @@
+"""
+metric_tools_benchmark.py — Typed metric tools versus free SQL for the common questions
+
+For each common question, compares the metric tool answering it (see `metric_tools.py`)
+with the path the agent takes without it: listing the tables, reading their schema and
+running the SQL below through `sql_db_query`. Reports for both:
+
+- the mean time of the tool calls themselves
+- the LLM round-trips (one per tool call, plus the final answer)
+- the estimated time per question, with every round-trip priced at the measured
+  latency of one `stub` completion (`--latency-ms`)
+
+Usage:
+    python benchmarks/metric_tools_benchmark.py [--latency-ms 300] [--repeat 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from environment import USER_ID, prepare_environment
+
+DAY, NEXT_DAY = "2016-04-12", "2016-04-13"
+
+# Question -> (metric tool name, its arguments, the SQL the agent would run instead)
+QUESTIONS = {
+    "steps today": ("get_day_summary", {"date": DAY}, [
+        f"SELECT totalsteps, calories, overallactiveminutes FROM daily_data WHERE date = '{DAY}'",
+        "SELECT metric, goal FROM fitness_goals",
+    ]),
+    "compare two days": ("compare_days", {"date_a": DAY, "date_b": NEXT_DAY}, [
+        f"SELECT date, totalsteps, calories, overallactiveminutes, total_sleep_minutes FROM daily_data "
+        f"WHERE date IN ('{DAY}', '{NEXT_DAY}')",
+    ]),
+    "weekly average": ("weekly_trend", {"end_date": NEXT_DAY, "weeks": 4}, [
+        f"SELECT week, totalsteps, calories, total_sleep_minutes FROM weekly_data "
+        f"WHERE substr(week, 1, 10) <= '{NEXT_DAY}' ORDER BY week DESC LIMIT 4",
+    ]),
+    "sleep last night": ("sleep_stages_for_night", {"night_date": DAY}, [
+        f"SELECT value, COUNT(*), MIN(timestamp), MAX(timestamp) FROM minute_sleep "
+        f"WHERE date IN ('{DAY}', '{NEXT_DAY}') AND timestamp >= '{DAY} 12:00:00' "
+        f"AND timestamp < '{NEXT_DAY} 12:00:00' GROUP BY value",
+    ]),
+    "heart rate zones": ("hr_zones_for_day", {"date": DAY}, [
+        f"SELECT MIN(value), AVG(value), MAX(value) FROM heartrate_minutes WHERE date = '{DAY}' AND value > 0",
+        # Zones are tenths of the maximum heart rate, 195 for this user
+        f"SELECT CAST(value * 10 / 195 AS INTEGER) AS zone, COUNT(*) FROM heartrate_minutes "
+        f"WHERE date = '{DAY}' AND value > 0 GROUP BY zone",
+    ]),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the metric tools with the free SQL path of the agent.")
+    parser.add_argument("--latency-ms", type=int, default=300, help="Latency of every stub completion")
+    parser.add_argument("--repeat", type=int, default=50, help="Calls per measurement")
+    return parser.parse_args()
+
+
+def mean_ms(func, repeat):
+    func()  # Warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(repeat):
+    from llm_provider import create_chat_model
+    from metric_tools import METRIC_TOOLS
+    from sql_tool import sql_db_query
+
+    config = {"configurable": {"user_id": USER_ID}}
+    metric_tools = {tool.name: tool for tool in METRIC_TOOLS}
+    model = create_chat_model()
+    round_trip_ms = mean_ms(lambda: model.invoke("How many steps did I walk today?"), max(1, repeat // 10))
+
+    results = {}
+    for question, (name, arguments, queries) in QUESTIONS.items():
+        def metric_path():
+            result = metric_tools[name].invoke(arguments, config=config)
+            assert "error" not in result, result
+
+        def sql_path():
+            for query in queries:
+                result = sql_db_query.invoke({"query": query}, config=config)
+                assert not result.startswith("Error"), result
+
+        # Listing the tables and reading the schema cost two round-trips before the first query
+        sql_round_trips = 2 + len(queries) + 1
+        results[question] = {
+            "metric": (mean_ms(metric_path, repeat), 2),
+            "sql": (mean_ms(sql_path, repeat), sql_round_trips),
+        }
+    return round_trip_ms, results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    prepare_environment(llm_latency_ms=args.latency_ms)
+
+    round_trip_ms, results = run(args.repeat)
+    print(f"stub provider, {args.latency_ms} ms latency: {round_trip_ms:.1f} ms per round-trip, mean of {args.repeat} calls")
+    for question, paths in results.items():
+        print(question)
+        for path, (tool_ms, round_trips) in paths.items():
+            estimate = tool_ms + round_trips * round_trip_ms
+            print(f"  {path:<7} tools {tool_ms:7.2f} ms, {round_trips} round-trips, ~{estimate:7.0f} ms per question")
@@ -0,0 +1,73 @@
+"""
+chat_history.py — In-process cache of recent conversation histories
+
+Every chat turn needs the history of its conversation. This module keeps the
+histories of the most recently used conversations in memory (LRU), together with
+the ID of the last message each one contains.
+
+The database stays the source of truth: every lookup asks it for the messages
+stored after that ID, which is a single index range read that is usually empty.
+Messages saved by other workers, or while the conversation was evicted, are
+therefore picked up without reloading the whole history.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Number of conversations kept in memory
+MAX_CACHED_CONVERSATIONS = 256
+
+
+class ConversationHistoryCache:
+    """
+    LRU cache of `(role, message)` lists keyed by conversation ID.
+
+    The database is read outside the lock; rows are added under the lock only if
+    their message ID is newer than the cached history, so concurrent lookups never
+    add a message twice.
+    """
+
+    def __init__(self, max_conversations=MAX_CACHED_CONVERSATIONS):
+        self.max_conversations = max_conversations
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id, load):
+        """
+        Return a copy of the conversation's history, brought up to date with the database.
+
+        `load(conversation_id, after_message_id)` must return the `(message_id, role, message)`
+        rows of the conversation with a message ID above `after_message_id`, in order.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(conversation_id)
+                last_message_id = entry["last_message_id"] if entry else 0
+
+            rows = load(conversation_id, last_message_id)
+
+            with self._lock:
+                entry = self._entries.get(conversation_id)
+                if entry is None and last_message_id:
+                    continue  # Evicted while loading; the rows loaded do not include the start of the history
+                if entry is None:
+                    entry = {"messages": [], "last_message_id": 0}
+                    self._entries[conversation_id] = entry
+                    while len(self._entries) > self.max_conversations:
+                        self._entries.popitem(last=False)
+                else:
+                    self._entries.move_to_end(conversation_id)
+
+                for message_id, role, message in rows:
+                    if message_id > entry["last_message_id"]:
+                        entry["messages"].append((role, message))
+                        entry["last_message_id"] = message_id
+                return list(entry["messages"])
+
+    def invalidate(self, conversation_id=None):
+        """Drop one conversation, or the whole cache when no ID is given."""
+        with self._lock:
+            if conversation_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(conversation_id, None)
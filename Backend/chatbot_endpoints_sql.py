@@ -8,18 +8,17 @@ This module provides all FastAPI endpoints related to chatbot functionality, inc
 - Interfacing with a SQL database using LangChain for query-based reasoning
 - Structuring workflows based on user input and prompt types
 
-It relies on OpenAI's LLMs (gpt-4o-mini) and LangChain's agent capabilities for data-driven insights.
+It relies on OpenAI's LLMs (gpt-4o-mini by default, see llm_provider.py) and LangChain's agent capabilities for data-driven insights.
 """
 
-import random
-import os
-import csv
+import asyncio
+import hashlib
+import logging
+import re
 import json
-import pandas as pd
-from dotenv import load_dotenv
-from fastapi import APIRouter, Query, BackgroundTasks
-from langchain_openai import ChatOpenAI
-from database import get_db, get_schema
+from fastapi import APIRouter, Query, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
+from database import get_schema, pool, run_db
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langgraph.prebuilt import create_react_agent
@@ -30,33 +29,41 @@ from langchain_community.utilities import SQLDatabase
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional
-from data_endpoints import reload_subjects, reload_messages
-
-
-# Load environment variables from the .env file (OPENAI_API_KEY)
-load_dotenv()
-
-# Access the OpenAI API key
-openai_api_key = os.getenv("OPENAI_API_KEY")
+from data_endpoints import VALID_TABLES
+from chat_history import ConversationHistoryCache
+from profiles import profiles, ProfileNotFoundError
+from response_cache import lookup_response, store_response
+from answer_cache import lookup_answer, store_answer
+from precomputed_outputs import load_output
+from single_flight import SingleFlight
+from sql_tool import sql_db_query
+from metric_tools import METRIC_TOOLS
+from data_context import build_data_context
+from question_classifier import classify_locally
+from llm_provider import create_chat_model
+
+
+logger = logging.getLogger(__name__)
 
 # Define router
 router = APIRouter()
 
-# File paths for storing data
-SUBJECTS_FILE = "data/conversation_subjects.csv"
-CONVERSATION_FILE = "data/conversation_messages.csv"
-PROFILES_FILE = "data/profiles.csv"
-
-# Initialize LLM and SQL Database tools
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3, api_key=openai_api_key)
+# Initialize LLM (backend selected by LLM_PROVIDER, see llm_provider.py) and SQL Database tools
+llm = create_chat_model(temperature=0.3)
 db_path = "data/fitness.db"
-db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
+# Recently used conversation histories, brought up to date with the database on every lookup
+history_cache = ConversationHistoryCache()
+
+# Only the fitness tables are exposed to the agent, never the stored conversations
+# Sample rows are left out of the table info, as they would show other users' data
+db = SQLDatabase.from_uri(f"sqlite:///{db_path}", include_tables=VALID_TABLES, sample_rows_in_table_info=0)
 
 # LangGraph state definitions for conversation and prompt workflows
 class FitnessChatState(TypedDict):
     """State used for fitness chatbot interactions."""
     user_id: str
     message: str
+    user_message: str
     conversation_id: str
     chat_history: list
     answer: str
@@ -69,6 +76,8 @@ class StandardState(TypedDict):
     query_type: str
     selected_prompt: str
     random_type: str
+    user_id: str
+    date: str
 
 # Pydantic request/response models
 class ChatRequest(BaseModel):
@@ -81,7 +90,7 @@ class ChatResponse(BaseModel):
     conversation_id: str
 
 # Cache the schema to avoid redundant DB lookups
-CACHED_SCHEMA = get_schema()
+CACHED_SCHEMA = get_schema(VALID_TABLES)
 
 # System prompt: guides the behavior, tone, and capabilities of the assistant
 system_prompt = f"""
@@ -118,6 +127,7 @@ Your role is to provide **insightful, clear, and personalized** answers based on
    - If the user asks for **weekly or monthly summaries**, retrieve **7-day or 30-day aggregated data**.
 
 5. **SQL Query Guidelines**:
+   - For a day's totals, a comparison of two days, weekly trends, a night's sleep stages or heart rate zones, use the tools `get_day_summary`, `compare_days`, `weekly_trend`, `sleep_stages_for_night` and `hr_zones_for_day` instead of writing SQL. Write SQL only for questions they do not cover.
    - **NEVER** generate queries that modify the database (NO `INSERT`, `UPDATE`, `DELETE`, `DROP`).
    - **Always select relevant columns only**, do not query `SELECT *`.
    - If the user asks for a **specific date**, filter using `WHERE date = 'YYYY-MM-DD'`.
@@ -288,6 +298,40 @@ Output the 3 questions in the following JSON format:
 """
 
 
+# Generation guidance per detail type, used in the detail prompts
+DETAIL_CLARIFICATIONS = {
+    "insight": (
+        "Analyze the chosen metric and identify a meaningful relationship with another metric from a different dataset. "
+        "This relationship should be unique, non-obvious, relevant and helpful for the user. For example: "
+        "'Your high step count right before bedtime might contribute to a restless start to your sleep because physical activity can increase alertness.' "
+        "or, 'You have a high heart rate before bedtime, which might affect your sleep quality of last night,' "
+        "or 'The fact that you weren't very active during the day might be contributing to poor sleep quality.' "
+        "These insights can also be positive as well! If someone had a higher heart rate throughout the day or less sedentary time than normal, this could for example enhance their sleep."
+        "Ensure that the relationship is causally correct: for example, 'Your total distance covered today is positively correlated "
+        "with your calorie burn, meaning the more distance you walk or run, the more calories you are likely to burn.' and not the other way around. "
+        "Explain the relationship clearly and why it matters, by using phrases like 'as a result of' or 'because' to clarify the direction of influence."
+        "Support your insight using your general knowledge about health, sleep, physical activity, and wellness guidelines when relevant. "
+        "Also REMEMBER: for example 15 minutes of bad sleep is normal, this will not have a big influence. Look for something that is special or unusual for the user."
+        "If possible make the insight actionable by suggesting why this relationship matters and how the user can leverage it to improve their routine."
+        "Keep the insight short and easy to read, this encourages the user to read it! Use emojis if this makes it easier. Maximum two sentences, around 50 words!"
+        "Also keep the words rather simple, don't formulate it in a difficult way!"
+    ),
+    "question": (
+        "Craft a thought-provoking question based on the data that encourages curiosity or leads to actionable exploration. "
+        "The question should be written from the user's perspective. For example: 'Why do I feel more tired on days with low activity even though I sleep enough?' "
+        "or 'Does my step count before bedtime affect my sleep quality?' Frame the question conversationally, as though the user is asking it."
+    ),
+    "advice": (
+        "Advice should offer actionable suggestions along with a reason why I should do this."
+        "For example: 'Try to go for a short walk before bedtime, this will help you reach your step goal and will positively influence your sleep quality.' "
+        "Advice the user somthing by talking directly to him, this can be done by using 'you'."
+        "Use your general knowledge of health, wellness, and fitness guidelines to guide your advice — but only suggest improvements if the user's data is outside of recommended healthy ranges. "
+        "Avoid recommending changes when the metric is already in a healthy range. "
+        "Keep the advice short and easy to read, this encourages the user to read it! Use emojis if this makes it easier. Maximum two sentences!"
+        "Make sure the advice is about the chosen metric. This way the user knows what to do.")
+}
+
+
 def detail_output(random_type):
     """
     Generate a system prompt instructing the language model to return either an 'insight', 'question', or 'advice' 
@@ -311,38 +355,7 @@ def detail_output(random_type):
     - The returned prompt enforces both content guidelines and output structure, ensuring consistency.
     - The LLM should not return anything outside the specified JSON format.
     """
-    type_clarification = {
-        "insight": (
-            "Analyze the chosen metric and identify a meaningful relationship with another metric from a different dataset. "
-            "This relationship should be unique, non-obvious, relevant and helpful for the user. For example: "
-            "'Your high step count right before bedtime might contribute to a restless start to your sleep because physical activity can increase alertness.' "
-            "or, 'You have a high heart rate before bedtime, which might affect your sleep quality of last night,' "
-            "or 'The fact that you weren't very active during the day might be contributing to poor sleep quality.' "
-            "These insights can also be positive as well! If someone had a higher heart rate throughout the day or less sedentary time than normal, this could for example enhance their sleep."
-            "Ensure that the relationship is causally correct: for example, 'Your total distance covered today is positively correlated "
-            "with your calorie burn, meaning the more distance you walk or run, the more calories you are likely to burn.' and not the other way around. "
-            "Explain the relationship clearly and why it matters, by using phrases like 'as a result of' or 'because' to clarify the direction of influence."
-            "Support your insight using your general knowledge about health, sleep, physical activity, and wellness guidelines when relevant. "
-            "Also REMEMBER: for example 15 minutes of bad sleep is normal, this will not have a big influence. Look for something that is special or unusual for the user."
-            "If possible make the insight actionable by suggesting why this relationship matters and how the user can leverage it to improve their routine."
-            "Keep the insight short and easy to read, this encourages the user to read it! Use emojis if this makes it easier. Maximum two sentences, around 50 words!"
-            "Also keep the words rather simple, don't formulate it in a difficult way!"
-        ),
-        "question": (
-            "Craft a thought-provoking question based on the data that encourages curiosity or leads to actionable exploration. "
-            "The question should be written from the user's perspective. For example: 'Why do I feel more tired on days with low activity even though I sleep enough?' "
-            "or 'Does my step count before bedtime affect my sleep quality?' Frame the question conversationally, as though the user is asking it."
-        ),
-        "advice": (
-            "Advice should offer actionable suggestions along with a reason why I should do this."
-            "For example: 'Try to go for a short walk before bedtime, this will help you reach your step goal and will positively influence your sleep quality.' "
-            "Advice the user somthing by talking directly to him, this can be done by using 'you'."
-            "Use your general knowledge of health, wellness, and fitness guidelines to guide your advice — but only suggest improvements if the user's data is outside of recommended healthy ranges. "
-            "Avoid recommending changes when the metric is already in a healthy range. "
-            "Keep the advice short and easy to read, this encourages the user to read it! Use emojis if this makes it easier. Maximum two sentences!"
-            "Make sure the advice is about the chosen metric. This way the user knows what to do.")
-    }
-    clarification_sentence = type_clarification.get(
+    clarification_sentence = DETAIL_CLARIFICATIONS.get(
         random_type, "Provide an interesting detail about the data.")
 
     return f""" I want to know something more about the chosen metric. Your task is to analyze the user's data and generate a detailed response by using your tools.
@@ -356,6 +369,32 @@ def detail_output(random_type):
     The first field indicates whether it's an 'insight', 'question', or 'advice', choose one of these randomly. The second field is the content.
     """
 
+
+def detail_output_all():
+    """
+    Generate a system prompt instructing the language model to return an 'insight', a 'question' and an 'advice'
+    about a selected fitness metric in one response, so all three share one data fetch.
+
+    Returns:
+    --------
+    str
+        A formatted system prompt string with the guidance of each type and a required JSON list output format.
+    """
+    clarifications = "\n".join(
+        f"    - {detail_type}: {clarification}" for detail_type, clarification in DETAIL_CLARIFICATIONS.items())
+
+    return f""" I want to know something more about the chosen metric. Your task is to analyze the user's data and generate a detailed response by using your tools.
+    In your response should be one item of each of the following types:
+{clarifications}
+    The generated response needs to be in the following JSON format, with the three items in this order.
+
+    [
+        {{"type": "insight", "content": "Your insight here."}},
+        {{"type": "question", "content": "Your question here."}},
+        {{"type": "advice", "content": "Your advice here."}}
+    ]
+    """
+
 # Prompt template for the conversational agent using chat history and scratchpad memory
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -366,14 +405,24 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
+# Tag of the model calls that write the answer; used to select the tokens streamed to the user.
+# It is bound to the model rather than passed to the graph, so nested calls (e.g. the SQL
+# query checker inside a tool) do not inherit it
+ANSWER_TAG = "chat_answer"
+answer_llm = llm.with_config(tags=[ANSWER_TAG])
+
 # Toolkit and agent setup for SQL-based fitness data retrieval
 toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-tools = toolkit.get_tools()
-agent_executor = create_react_agent(llm, tools, prompt=system_prompt)
+# The toolkit's query tool is replaced by the guarded, user-scoped one (see sql_tool.py);
+# the typed metric tools come first, free SQL is the fallback (see metric_tools.py)
+tools = METRIC_TOOLS + [tool for tool in toolkit.get_tools() if tool.name != "sql_db_query"] + [sql_db_query]
+# Tools are bound before tagging; create_react_agent would otherwise rebind them and drop the tag
+agent_executor = create_react_agent(
+    llm.bind_tools(tools).with_config(tags=[ANSWER_TAG]), tools, prompt=system_prompt)
 
 def get_user_info(user_id):
     """
-    Retrieve user profile information by ID from the profiles CSV.
+    Retrieve user profile information by ID from the cached profile repository.
 
     Parameters:
     -----------
@@ -382,21 +431,15 @@ def get_user_info(user_id):
 
     Returns:
     --------
-    dict or None
-        A dictionary with user profile data if found, otherwise None.
-    """
-    try:
-        df = pd.read_csv(PROFILES_FILE, dtype={"id": str})
-        user_data = df[df["id"] == user_id]
-        if not user_data.empty:
-            return user_data.iloc[0].to_dict()
-        else:
-            return None
+    dict
+        A dictionary with the user's profile data.
 
-    except FileNotFoundError:
-        return None
-    except Exception as e:
-        return None
+    Raises:
+    -------
+    ProfileNotFoundError
+        If no profile exists for the user.
+    """
+    return profiles.get(user_id)
 
 
 def generate_conversation_title(user_message, ai_response):
@@ -418,56 +461,141 @@ def generate_conversation_title(user_message, ai_response):
     return response.content.strip()
 
 
+def save_generated_subject(conversation_id, user_id, user_message, ai_response):
+    """Generate a title for a new conversation and save it. Runs as a background task after the response is sent."""
+    title = generate_conversation_title(user_message, ai_response)
+    save_subject(conversation_id, user_id, title)
+
+
 def save_subject(conversation_id, user_id, title):
-    """Save a subject (generated title) to the CSV."""
+    """Save a subject (generated title) to the conversation subjects table."""
     timestamp = datetime.now().isoformat()
     clean_title = title.encode(
         # Sanitize text
-        'utf-8', 'ignore').decode('utf-8').replace('\u0092', "'")
-    with open(SUBJECTS_FILE, mode="a", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file, quoting=csv.QUOTE_MINIMAL)
-        writer.writerow([conversation_id, user_id, clean_title, timestamp])
-    reload_subjects()
+        'utf-8', 'ignore').decode('utf-8').replace('\u0092', "'").strip('"')
+    with pool.connection(write=True) as connection:
+        connection.execute(
+            "INSERT INTO conversation_subjects (conversation_id, user_id, subject, timestamp) VALUES (?, ?, ?, ?)",
+            (conversation_id, user_id, clean_title, timestamp))
+        connection.commit()
 
 def save_message(conversation_id, user_id, role, message):
     """
-    Save a message (user or assistant) to the conversation CSV file.
-    Automatically appends a timestamp and reloads the message history.
+    Save a message (user or assistant) to the conversation messages table.
+    Automatically appends a timestamp; the cached history picks it up on its next lookup.
     """
     timestamp = datetime.now().isoformat()
     clean_message = message.encode(
         'utf-8', 'ignore').decode('utf-8').replace('\u0092', "'")
 
-    with open(CONVERSATION_FILE, mode="a", newline="", encoding='utf-8') as file:
-        writer = csv.writer(file, quoting=csv.QUOTE_MINIMAL)
-        writer.writerow([conversation_id, user_id,
-                        role, clean_message, timestamp])
-    reload_messages()
+    with pool.connection(write=True) as connection:
+        connection.execute(
+            "INSERT INTO conversation_messages (conversation_id, user_id, role, message, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (conversation_id, user_id, role, clean_message, timestamp))
+        connection.commit()
+
+
+def load_conversation_messages(conversation_id, after_message_id=0):
+    """Read the `(message_id, role, message)` rows of a conversation stored after `after_message_id`, in order."""
+    with pool.connection() as connection:
+        rows = connection.execute(
+            "SELECT message_id, role, message FROM conversation_messages "
+            "WHERE conversation_id = ? AND message_id > ? ORDER BY message_id",
+            (conversation_id, after_message_id)).fetchall()
+    return [(row["message_id"], row["role"], row["message"] or "") for row in rows]
+
+
+def load_history_summary(conversation_id):
+    """Return `(summary, covered_messages)` of a conversation, or `("", 0)` if it has no summary yet."""
+    with pool.connection() as connection:
+        row = connection.execute(
+            "SELECT summary, covered_messages FROM conversation_summaries WHERE conversation_id = ?",
+            (conversation_id,)).fetchone()
+    return (row["summary"], row["covered_messages"]) if row else ("", 0)
+
+
+def store_history_summary(conversation_id, summary, covered_messages):
+    """Store the rolling summary of a conversation, unless a summary covering more messages was stored meanwhile."""
+    with pool.connection(write=True) as connection:
+        connection.execute(
+            "INSERT INTO conversation_summaries (conversation_id, summary, covered_messages, updated_at) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (conversation_id) DO UPDATE SET summary = excluded.summary, "
+            "covered_messages = excluded.covered_messages, updated_at = excluded.updated_at "
+            "WHERE excluded.covered_messages > conversation_summaries.covered_messages",
+            (conversation_id, summary, covered_messages, datetime.now().isoformat()))
+        connection.commit()
+
+
+# Number of most recent messages (user and assistant) passed to the LLM verbatim
+HISTORY_WINDOW_MESSAGES = 6
+
+# Number of messages that must have left the window before the summary is updated
+SUMMARY_BATCH_MESSAGES = 4
 
 
 def get_chat_history(conversation_id):
     """
-    Retrieve the full message history for a given conversation ID.
+    Retrieve the prompt history for a given conversation ID.
+    Recent conversations are served from `history_cache`; the summary is read from the database.
+
+    Only the last `HISTORY_WINDOW_MESSAGES` messages are returned verbatim. Older
+    messages are represented by the conversation's rolling summary, which is kept
+    up to date by `update_history_summary`.
 
     Returns:
     --------
     list
-        A list of HumanMessage and AIMessage objects to be used in chat context.
-    """
-    history = [""]
-    with open(CONVERSATION_FILE, mode="r", encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["conversation_id"] == conversation_id:
-                if row["role"] == "user":
-                    history.append(HumanMessage(content=row["message"]))
-                elif row["role"] == "assistant":
-                    history.append(AIMessage(content=row["message"]))
+        An optional SystemMessage with the summary, followed by HumanMessage and
+        AIMessage objects to be used in chat context.
+    """
+    messages = history_cache.get(conversation_id, load_conversation_messages)
+    summary, _ = load_history_summary(conversation_id)
+
+    history = []
+    if summary and len(messages) > HISTORY_WINDOW_MESSAGES:
+        history.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+    for role, message in messages[-HISTORY_WINDOW_MESSAGES:]:
+        if role == "user":
+            history.append(HumanMessage(content=message))
+        elif role == "assistant":
+            history.append(AIMessage(content=message))
 
     return history
 
-def classify_question(state):
+
+def update_history_summary(conversation_id):
+    """
+    Fold the messages that left the history window into the conversation's rolling summary.
+    Runs as a background task after the response is sent, once enough messages have accumulated.
+    """
+    messages = history_cache.get(conversation_id, load_conversation_messages)
+    older = messages[:-HISTORY_WINDOW_MESSAGES]
+    summary, covered = load_history_summary(conversation_id)
+    if len(older) - covered < SUMMARY_BATCH_MESSAGES:
+        return
+
+    transcript = "\n".join(f"{role}: {message}" for role, message in older[covered:])
+    prompt_summary = f"""
+    Update the summary of a conversation between a user and their fitness coach.
+    Current summary: {summary or "(none)"}
+    New messages:
+    {transcript}
+    Keep the facts the coach needs later (the user's questions, goals, circumstances and the advice given).
+    Provide only the updated summary, in at most 120 words.
+    """
+    response = llm.invoke(prompt_summary)
+    store_history_summary(conversation_id, response.content.strip(), len(older))
+
+
+async def classify_question(state):
     """Determines if user data is needed and updates state."""
+    # Clear-cut questions are classified locally; the LLM only decides the ambiguous ones
+    if state.get("user_message"):
+        requires_data = classify_locally(state["user_message"])
+        if requires_data is not None:
+            return {"requires_data": requires_data}
+
     classification_prompt = ChatPromptTemplate.from_messages(
         [
             ("system", "You are a fitness assistant. Determine if the following question requires user-specific fitness data."),
@@ -481,11 +609,11 @@ def classify_question(state):
         ]
     )
 
-    classification_response = llm.invoke(
+    classification_response = (await llm.ainvoke(
         classification_prompt.format_messages(
             question=state["message"], chat_history=state["chat_history"]
         )
-    ).content.strip().lower()
+    )).content.strip().lower()
 
     return {"requires_data": "data" in classification_response}
 
@@ -509,14 +637,16 @@ def get_prompt(state):
     }
 
     if query_type == "detail":
-        prompts["detail"] = detail_output(state.get("random_type", "insight"))
+        random_type = state.get("random_type", "insight")
+        prompts["detail"] = detail_output_all() if random_type == "all" else detail_output(random_type)
 
     # Default prompt if query_type is unknown
     return {"selected_prompt": prompts.get(query_type, "Provide a fitness-related response.")}
 
 
+
 # LLM Answer Node (when no user data is needed)
-def llm_response(state):
+async def llm_response(state):
     """Directly answer the user's question using LLM knowledge."""
 
     chat_history = state.get("chat_history", [])
@@ -527,10 +657,10 @@ def llm_response(state):
         HumanMessage(content=state["message"]),
     ]
 
-    response = llm.invoke(messages)
+    response = await answer_llm.ainvoke(messages)
     return {"answer": response.content}
 
-def retrieve_and_answer(state):
+async def retrieve_and_answer(state):
     """Fetch user-specific data and generate an answer."""
     if "query_type" in state:
         input_prompt = state["selected_prompt"] + " " + state["message"]
@@ -538,20 +668,104 @@ def retrieve_and_answer(state):
     else:
         messages = state.get("chat_history", []) + \
             [{"role": "user", "content": state["message"]}]
-    response = agent_executor.invoke({"messages": messages} , {"recursion_limit": 35})
+    config = {"recursion_limit": 35, "configurable": {"user_id": state.get("user_id")}}
+    response = await agent_executor.ainvoke({"messages": messages}, config)
 
     state.pop("query_type", None)
     state["answer"] = response["messages"][-1].content
     return state
 
-def format_output_response(state):
+# Marker the LLM returns when the prefetched data is not enough to answer
+NEED_MORE_DATA = "NEED_MORE_DATA"
+
+async def answer_with_context(state):
+    """
+    Answer a generator request in a single LLM call using prefetched data.
+
+    The data the generator prompts need (recent daily data, last night's sleep, weekly
+    totals and goals) is queried directly and added to the prompt. If no data is found,
+    or the LLM cannot answer from it, the answer stays empty and the SQL agent takes over.
+    """
+    if not state.get("user_id") or not state.get("date"):
+        return {"answer": ""}
+
+    data_context = await run_db(build_data_context, state["user_id"], state["date"])
+    if not data_context:
+        return {"answer": ""}
+
+    messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=(
+            f"{state['selected_prompt']} {state['message']}\n\n"
+            "You do not need tools: the user's data is listed below. "
+            f"If this data is not enough to answer, reply with exactly {NEED_MORE_DATA}.\n\n"
+            f"{data_context}"
+        )),
+    ]
+    content = (await llm.ainvoke(messages)).content
+
+    if NEED_MORE_DATA in content or not parse_response_content(content):
+        return {"answer": ""}
+    return {"answer": content}
+
+
+def route_after_context(state):
+    """Falls back to the SQL agent when the prefetched data did not produce an answer."""
+    if state.get("answer"):
+        return "return_result"
+    return "retrieve_and_answer"
+
+
+# Local checks mirroring the judge rules; the judge LLM only runs when one of them fails
+LIST_ITEM_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+", re.MULTILINE)
+EXPLICIT_COUNT_PATTERN = re.compile(
+    r"\b(?:\d+|four|five|six|seven|eight|nine|ten)\s+(?:\w+\s+)?"
+    r"(?:tips|ideas|ways|recommendations|suggestions|examples|exercises|points|things|reasons|options)\b",
+    re.IGNORECASE)
+TECHNICAL_TERMS_PATTERN = re.compile(
+    r"\b(?:sql|select|query|queries|database|schema|tables?|columns?|" + "|".join(VALID_TABLES) + r")\b",
+    re.IGNORECASE)
+SLEEP_PATTERN = re.compile(r"\b(?:sleep|slept|asleep|bed)", re.IGNORECASE)
+SLEEP_MINUTES_PATTERN = re.compile(r"\b\d{2,}\s*(?:minutes|mins?)\b", re.IGNORECASE)
+ID_PATTERN = re.compile(r"\b\d{8,}\b")
+MEDICAL_PATTERN = re.compile(
+    r"\b(?:diagnos\w*|medications?|medicines?|prescri\w*|dosages?|doses?|pills?|drugs?|\d+\s*mg)\b", re.IGNORECASE)
+
+
+def answer_is_compliant(question, answer):
+    """
+    Cheaply check an answer against the rules enforced by the judge in `format_output_response`.
+
+    Returns False when the answer has more than 3 list items (and the question does not ask
+    for a specific number), mentions technical storage terms or IDs, talks about sleep
+    in minutes or touches on diagnoses or medication. False positives only cost an extra judge call.
+    """
+    if len(LIST_ITEM_PATTERN.findall(answer)) > 3 and not EXPLICIT_COUNT_PATTERN.search(question):
+        return False
+    if TECHNICAL_TERMS_PATTERN.search(answer) or ID_PATTERN.search(answer):
+        return False
+    if SLEEP_PATTERN.search(answer) and SLEEP_MINUTES_PATTERN.search(answer):
+        return False
+    if MEDICAL_PATTERN.search(answer):
+        return False
+    return True
+
+
+# Deterministic LLM used to judge and correct final chat answers
+judge_llm = create_chat_model(temperature=0)
+
+async def format_output_response(state):
     """
     Runs the final assistant response through a formatting LLM to:
     - Enforce output constraints (e.g., 3 bullet point limit)
     - Hide SQL/database details
     - Format sleep times as hours and minutes
+    - Replace diagnoses and medication advice with a referral to a doctor
+
+    The judge is skipped when `answer_is_compliant` finds nothing to correct.
     """
-    judge_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    if answer_is_compliant(state["message"], state["answer"]):
+        return state
 
     # Strict judging system prompt
     system_msg = SystemMessage(content="""
@@ -561,6 +775,7 @@ def format_output_response(state):
         - NEVER include more than 3 bullet points or list items **unless the user's question explicitly asks for more**.
         - NEVER expose technical details such as SQL queries, table names, IDs, or storage mechanisms.
         - ALWAYS convert sleep durations to hours and minutes (e.g., 650 minutes → "10h 50m") unless the user asks for minutes.
+        - NEVER diagnose conditions or recommend medication, doses or drugs; suggest seeing a doctor instead.
         - Only correct what breaks these rules — do NOT add new information or rephrase unnecessarily.
         - If the answer is already clean and compliant, don't adjust the answer but return it as it is!
 
@@ -575,7 +790,7 @@ def format_output_response(state):
         {state["answer"]}
         """)
 
-    revised = judge_llm.invoke([system_msg, human_msg])
+    revised = await judge_llm.ainvoke([system_msg, human_msg])
     state["answer"] = revised.content
     return state
 
@@ -588,10 +803,14 @@ def format_output_response(state):
 chat_workflow = StateGraph(state_schema=FitnessChatState)
 
 # Step 1: Retrieve Chat History
-chat_workflow.add_node("retrieve_chat_history", lambda state: {
-    "chat_history": get_chat_history(state["conversation_id"]),
-    "question": state["message"]
-})
+async def retrieve_chat_history(state):
+    """Loads the conversation history without blocking the event loop."""
+    return {
+        "chat_history": await asyncio.to_thread(get_chat_history, state["conversation_id"]),
+        "question": state["message"]
+    }
+
+chat_workflow.add_node("retrieve_chat_history", retrieve_chat_history)
 chat_workflow.add_edge("retrieve_chat_history", "classify_question")
 
 # Step 2: Classify if the question requires user-specific fitness data
@@ -635,9 +854,17 @@ workflow = StateGraph(state_schema=StandardState)
 
 # Step 1: Select Prompt bas on query
 workflow.add_node("select_prompt", get_prompt)
-workflow.add_edge("select_prompt", "retrieve_and_answer")
+workflow.add_edge("select_prompt", "answer_with_context")
+
+# Step 2: Answer in one LLM call from prefetched data when possible
+workflow.add_node("answer_with_context", answer_with_context)
+workflow.add_conditional_edges(
+    "answer_with_context",
+    route_after_context,
+    {"return_result": "return_result", "retrieve_and_answer": "retrieve_and_answer"}
+)
 
-# Step 2: Retrieve data and generate structured responses
+# Step 3: Fallback: let the SQL agent retrieve data and generate structured responses
 workflow.add_node("retrieve_and_answer", retrieve_and_answer)
 workflow.add_edge("retrieve_and_answer", "return_result")
 
@@ -651,6 +878,13 @@ workflow.set_entry_point("select_prompt")
 graph = workflow.compile()
 
 
+# Concurrent identical generator requests share one workflow run
+generations = SingleFlight()
+
+# Types of output the detail endpoint can generate
+DETAIL_TYPES = ["insight", "question", "advice"]
+
+
 def parse_response_content(response_content):
     """Attempts to parse the JSON content from an LLM response."""
     content_cleaned = response_content.strip("```").strip("json").strip()
@@ -667,22 +901,19 @@ async def root():
     return {"message": "Welcome to the Fitness Chatbot part"}
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
-    """
-    Main chat endpoint for conversational interaction.
+@router.get("/coalescing_stats")
+async def get_coalescing_stats():
+    """Counters of generator workflow runs started, requests coalesced into a running one, and runs in flight."""
+    return generations.stats()
 
-    - Constructs a prompt using the user's message and profile
-    - Passes this to the LangGraph agent
-    - Stores conversation data and title in the background
-    """
 
-    user_id = request.user_id
-    user_profile = get_user_info(user_id)
+# Date the chat assumes as "today"; cached chat answers are scoped to it
+CHAT_DATE = "2016-04-14"
 
-    try:
-        conversation_id = request.conversation_id or f"{request.user_id}_{int(datetime.now().timestamp())}"
-        question = f"""
+
+def build_chat_question(user_profile, user_id, message):
+    """Wraps the user's message with today's date and their profile details."""
+    return f"""
         Today is 14-04-2016. The user details are:
         - Name: {user_profile.get('name')}
         - Age: {user_profile.get('age')} years old
@@ -690,30 +921,88 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks)
         - Gender: {user_profile.get('gender')}
         - ID: {user_id}
 
-        This is the users question: {request.message}
+        This is the users question: {message}
         """
-        state = FitnessChatState(
-            message=question, conversation_id=conversation_id, user_id=user_id)
 
-        response = chat_graph.invoke(state)
 
-        def clean_text(text):
-            return text.encode('utf-8', 'ignore').decode('utf-8').replace('\u0092', "'")
+def clean_text(text):
+    """Sanitize text before it is stored."""
+    return text.encode('utf-8', 'ignore').decode('utf-8').replace('\u0092', "'")
 
-        bot_response = clean_text(response["answer"])
-        clean_question = clean_text(question)
 
-        if not request.conversation_id:
-            title = generate_conversation_title(question, response["answer"])
-            background_tasks.add_task(
-                save_subject, conversation_id, user_id, title)
+def schedule_chat_persistence(background_tasks, conversation_id, user_id, message, answer, new_conversation):
+    """
+    Stores both messages, and the title of a new conversation, once the response has been sent.
+    The user's message is stored as typed, without the profile preamble of the question.
+    """
+    background_tasks.add_task(
+        save_message, conversation_id, user_id, "user", clean_text(message))
+    background_tasks.add_task(
+        save_message, conversation_id, user_id, "assistant", clean_text(answer))
 
+    # The title and the history summary need their own LLM calls, so they are generated after the response is sent
+    if new_conversation:
         background_tasks.add_task(
-            save_message, conversation_id, user_id, "user", clean_question)
+            save_generated_subject, conversation_id, user_id, message, answer)
+    else:
+        background_tasks.add_task(update_history_summary, conversation_id)
+
+
+async def find_cached_answer(request):
+    """
+    Look up a cached answer to the opening question of a new conversation.
+    Follow-up questions depend on their conversation's history and are never cached.
+
+    Returns:
+    --------
+    tuple
+        `(fingerprint, answer)` as returned by `lookup_answer`, or `(None, None)` for follow-up questions.
+    """
+    if request.conversation_id:
+        return None, None
+    return await run_db(lookup_answer, request.user_id, CHAT_DATE, request.message, write=True)
+
+
+def schedule_answer_caching(background_tasks, request, fingerprint, answer):
+    """Stores a newly generated answer to an opening question once the response has been sent."""
+    if fingerprint is not None:
         background_tasks.add_task(
-            save_message, conversation_id, user_id, "assistant", bot_response)
+            run_db, store_answer, request.user_id, CHAT_DATE, fingerprint, request.message, answer, write=True)
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
+    """
+    Main chat endpoint for conversational interaction.
+
+    - Constructs a prompt using the user's message and profile
+    - Returns the cached answer when the same opening question was answered before
+    - Otherwise passes the prompt to the LangGraph agent
+    - Stores conversation data and title in the background
+    """
+
+    user_id = request.user_id
+    try:
+        user_profile = get_user_info(user_id)
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        conversation_id = request.conversation_id or f"{request.user_id}_{int(datetime.now().timestamp())}"
+        question = build_chat_question(user_profile, user_id, request.message)
+        state = FitnessChatState(
+            message=question, user_message=request.message, conversation_id=conversation_id, user_id=user_id)
+
+        fingerprint, answer = await find_cached_answer(request)
+        if answer is None:
+            response = await chat_graph.ainvoke(state)
+            answer = response["answer"]
+            schedule_answer_caching(background_tasks, request, fingerprint, answer)
 
-        return ChatResponse(response=response["answer"], conversation_id=response["conversation_id"])
+        schedule_chat_persistence(
+            background_tasks, conversation_id, user_id, request.message, answer, not request.conversation_id)
+
+        return ChatResponse(response=answer, conversation_id=conversation_id)
 
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
@@ -723,18 +1012,135 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks)
         )
 
 
-@router.get("/recommendations")
-async def get_recommendations(date: str = Query(..., description="Date in YYYY-MM-DD format"), user_id: str = Query(..., description="User ID to filter the data")):
+# Progress messages shown while the chat graph runs, keyed by node name
+STREAM_PROGRESS_MESSAGES = {
+    "classify_question": "Reading your question…",
+    "llm_answer": "Thinking about your question…",
+    "fetch_data": "Looking at your fitness data…",
+    "format_output_response": "Polishing the answer…",
+}
+
+# Progress messages shown when the agent uses one of its tools
+STREAM_TOOL_MESSAGES = {
+    "get_day_summary": "Looking at your day…",
+    "compare_days": "Comparing your days…",
+    "weekly_trend": "Looking at your weekly trend…",
+    "sleep_stages_for_night": "Looking at your sleep…",
+    "hr_zones_for_day": "Looking at your heart rate…",
+    "sql_db_list_tables": "Checking which data is available…",
+    "sql_db_schema": "Checking which data is available…",
+    "sql_db_query_checker": "Preparing to look up your data…",
+    "sql_db_query": "Looking at your fitness data…",
+}
+
+
+# Graph nodes whose model calls write the answer: the direct answer and the agent's model node
+STREAM_ANSWER_NODES = {"llm_answer", "agent"}
+
+
+def is_answer_chunk(event, tool_run_ids):
     """
-    Generate 3 personalised, actionable fitness recommendations for the given user and date.
+    Whether an `on_chat_model_stream` event is part of the answer shown to the user.
 
-    - Uses user's profile, goals, and daily data
-    - Returns response in strict JSON format
+    Only chunks of the tagged answer model in an answer node qualify. Chunks of the agent's
+    tool-calling turns and of model calls made inside a tool (`tool_run_ids`) are dropped.
     """
-    user_profile = get_user_info(user_id)
-    if not user_profile:
-        return {"error": "User not found"}
+    if ANSWER_TAG not in event.get("tags", []):
+        return False
+    if event.get("metadata", {}).get("langgraph_node") not in STREAM_ANSWER_NODES:
+        return False
+    if tool_run_ids.intersection(event.get("parent_ids", [])):
+        return False
+    return not getattr(event["data"]["chunk"], "tool_call_chunks", None)
+
+
+def format_sse(event, data):
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
+    """
+    Streaming variant of `/chat` using server-sent events.
+
+    Emits the following events:
+    - `progress`: a short status message while the graph runs ("Looking at your fitness data…")
+    - `token`: a piece of the answer as it is generated
+    - `answer`: the final (formatted) answer and conversation ID; this replaces the streamed tokens
+    - `error`: sent instead of `answer` when the request fails
+
+    A cached answer to an opening question is sent as a single `answer` event.
+    The conversation is stored once the stream has completed, like in `/chat`.
+    """
+    user_id = request.user_id
+    try:
+        user_profile = get_user_info(user_id)
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    conversation_id = request.conversation_id or f"{request.user_id}_{int(datetime.now().timestamp())}"
+    question = build_chat_question(user_profile, user_id, request.message)
+    state = FitnessChatState(
+        message=question, user_message=request.message, conversation_id=conversation_id, user_id=user_id)
+
+    async def event_stream():
+        final_state = None
+        last_progress = None
+        tool_run_ids = set()
+        try:
+            fingerprint, answer = await find_cached_answer(request)
+            if answer is not None:
+                schedule_chat_persistence(
+                    background_tasks, conversation_id, user_id, request.message, answer, not request.conversation_id)
+                yield format_sse("answer", {"response": answer, "conversation_id": conversation_id})
+                return
+
+            async for event in chat_graph.astream_events(state, version="v2"):
+                kind = event["event"]
+                progress = None
+
+                if kind == "on_chain_start":
+                    progress = STREAM_PROGRESS_MESSAGES.get(event["name"])
+                elif kind == "on_tool_start":
+                    tool_run_ids.add(event["run_id"])
+                    progress = STREAM_TOOL_MESSAGES.get(event["name"])
+                elif kind == "on_chat_model_stream" and is_answer_chunk(event, tool_run_ids):
+                    token = event["data"]["chunk"].content
+                    if token:
+                        yield format_sse("token", {"content": token})
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    final_state = event["data"]["output"]
+
+                if progress and progress != last_progress:
+                    last_progress = progress
+                    yield format_sse("progress", {"message": progress})
+
+            answer = final_state["answer"]
+            schedule_answer_caching(background_tasks, request, fingerprint, answer)
+            schedule_chat_persistence(
+                background_tasks, conversation_id, user_id, request.message, answer, not request.conversation_id)
+            yield format_sse("answer", {"response": answer, "conversation_id": conversation_id})
+
+        except Exception:
+            logger.exception("Error in chat stream endpoint for conversation %s", conversation_id)
+            yield format_sse("error", {
+                "response": "An error occurred while processing your request. Please try again.",
+                "conversation_id": conversation_id
+            })
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", background=background_tasks)
+
+
+async def generate_recommendations(user_profile, user_id, date):
+    """
+    Run the recommendations workflow for a user and date.
+
+    Returns:
+    --------
+    dict or None
+        `{"recommendations": [...]}`, or None if the LLM output could not be parsed.
+    """
     question = f"""
     Today is {date}. The user details are:
     - Name: {user_profile.get('name')}
@@ -747,12 +1153,43 @@ async def get_recommendations(date: str = Query(..., description="Date in YYYY-M
     Format the response strictly in JSON!
     """
 
-    response = graph.invoke(
-        {"query_type": "recommendations", "message": question})
+    response = await graph.ainvoke(
+        {"query_type": "recommendations", "message": question, "user_id": user_id, "date": date})
     data = parse_response_content(response["answer"])
+    return {"recommendations": data} if data else None
+
+
+@router.get("/recommendations")
+async def get_recommendations(date: str = Query(..., description="Date in YYYY-MM-DD format"), user_id: str = Query(..., description="User ID to filter the data")):
+    """
+    Generate 3 personalised, actionable fitness recommendations for the given user and date.
+
+    - Uses user's profile, goals, and daily data
+    - Serves the nightly precomputed result when available (see batch_precompute.py)
+    - Returns response in strict JSON format
+    """
+    try:
+        user_profile = get_user_info(user_id)
+    except ProfileNotFoundError:
+        return {"error": "User not found"}
+
+    precomputed = await run_db(load_output, "recommendations", user_id, date)
+    if precomputed is not None:
+        return precomputed
+
+    cache_key, cached = await run_db(lookup_response, "recommendations", user_id, date, {"date": date, "user_id": user_id})
+    if cached is not None:
+        return cached
 
-    if data:
-        return {"recommendations": data}
+    async def generate_and_cache():
+        result = await generate_recommendations(user_profile, user_id, date)
+        if result:
+            await run_db(store_response, cache_key, "recommendations", user_id, result, write=True)
+        return result
+
+    result = await generations.run(cache_key, generate_and_cache)
+    if result:
+        return result
     return {"error": "Failed to generate recommendations. Please try again."}
 
 
@@ -770,10 +1207,16 @@ async def get_new_goal(
     - Takes current goal, last week's average, and user profile into account
     - Returns the goal and a short justification in JSON format
     """
-    user_profile = get_user_info(user_id)
-    if not user_profile:
+    try:
+        user_profile = get_user_info(user_id)
+    except ProfileNotFoundError:
         return {"error": "User not found"}
 
+    params = {"date": date, "metric": metric, "current_goal": current_goal, "user_id": user_id, "average": average}
+    cache_key, cached = await run_db(lookup_response, "new_goal", user_id, date, params)
+    if cached is not None:
+        return cached
+
     if average > 0:
         extra = f"\n    The user had an average of {average} last week!"
     else:
@@ -795,26 +1238,30 @@ async def get_new_goal(
     Format the response strictly in JSON!
     """
 
-    response = graph.invoke({"query_type": "goal", "message": question})
-    data = parse_response_content(response["answer"])
+    async def generate_and_cache():
+        response = await graph.ainvoke({"query_type": "goal", "message": question, "user_id": user_id, "date": date})
+        data = parse_response_content(response["answer"])
+        if not data:
+            return None
+        result = {"suggestion": data}
+        await run_db(store_response, cache_key, "new_goal", user_id, result, write=True)
+        return result
 
-    if data:
-        return {"suggestion": data}
+    result = await generations.run(cache_key, generate_and_cache)
+    if result:
+        return result
     return {"error": "Failed to generate recommendations. Please try again."}
 
 
-@router.get("/suggested_questions")
-async def get_suggested_questions(date: str = Query(..., description="Date in YYYY-MM-DD format"), user_id: str = Query(..., description="User ID to filter the data")):
+async def generate_suggested_questions(user_profile, user_id, date):
     """
-    Return 3 diverse questions the user could ask the chatbot based on their profile and possible interests.
-    
-    - Aims to spark exploration and increase engagement
-    - Questions are personalised and varied
-    """
-    user_profile = get_user_info(user_id)
-    if not user_profile:
-        return {"error": "User not found"}
+    Run the suggested questions workflow for a user and date.
 
+    Returns:
+    --------
+    dict or None
+        `{"questions": [...]}`, or None if the LLM output could not be parsed.
+    """
     question = f"""
     Today is {date}. The user details are:
     - Name: {user_profile.get('name')}
@@ -829,33 +1276,72 @@ async def get_suggested_questions(date: str = Query(..., description="Date in YY
     Format the response strictly in JSON!
     """
 
-    response = graph.invoke(
-        {"query_type": "suggested_questions", "message": question})
+    response = await graph.ainvoke(
+        {"query_type": "suggested_questions", "message": question, "user_id": user_id, "date": date})
     data = parse_response_content(response["answer"])
+    return {"questions": data} if data else None
+
+
+@router.get("/suggested_questions")
+async def get_suggested_questions(date: str = Query(..., description="Date in YYYY-MM-DD format"), user_id: str = Query(..., description="User ID to filter the data")):
+    """
+    Return 3 diverse questions the user could ask the chatbot based on their profile and possible interests.
+    
+    - Aims to spark exploration and increase engagement
+    - Questions are personalised and varied
+    - Serves the nightly precomputed result when available (see batch_precompute.py)
+    """
+    try:
+        user_profile = get_user_info(user_id)
+    except ProfileNotFoundError:
+        return {"error": "User not found"}
+
+    precomputed = await run_db(load_output, "suggested_questions", user_id, date)
+    if precomputed is not None:
+        return precomputed
 
-    if data:
-        return {"questions": data}
+    cache_key, cached = await run_db(lookup_response, "suggested_questions", user_id, date, {"date": date, "user_id": user_id})
+    if cached is not None:
+        return cached
+
+    async def generate_and_cache():
+        result = await generate_suggested_questions(user_profile, user_id, date)
+        if result:
+            await run_db(store_response, cache_key, "suggested_questions", user_id, result, write=True)
+        return result
+
+    result = await generations.run(cache_key, generate_and_cache)
+    if result:
+        return result
     return {"error": "Failed to generate recommendations. Please try again."}
 
 
-@router.get("/detail")
-async def get_detail(
-    date: str = Query(..., description="Date in YYYY-MM-DD format"),
-    metric: str = Query(..., description="Metric for the goal, e.g., 'steps'"),
-    user_id: str = Query(..., description="User ID to filter the data")
-):
+def default_detail_type(user_id, date, metric):
     """
-    Generate a specific 'insight', 'question', or 'advice' for a chosen metric.
+    Pick the detail type shown when the client does not ask for one.
+    The choice is seeded by user, date and metric, so it varies across metrics and days
+    but identical requests get the same type and can be cached and coalesced.
+    """
+    seed = hashlib.sha256(f"{user_id}:{date}:{metric}".encode("utf-8")).digest()
+    return DETAIL_TYPES[seed[0] % len(DETAIL_TYPES)]
 
-    - Randomly selects the type
-    - Leverages user's profile and metric focus
-    - Avoids future speculation
+
+async def generate_detail(user_profile, user_id, date, metric, random_type):
     """
-    user_profile = get_user_info(user_id)
-    if not user_profile:
-        return {"error": "User not found"}
+    Run the detail workflow for a user, date, metric and type ('insight', 'question' or 'advice').
+    With type 'all', one run (with one data fetch) generates all three.
+
+    Returns:
+    --------
+    dict or None
+        `{"output": {...}}`, or `{"outputs": [...]}` with one item per type (in `DETAIL_TYPES` order) for type 'all',
+        or None if the LLM output could not be parsed or misses a type.
+    """
+    if random_type == "all":
+        requested = "**insight**, **question** and **advice**"
+    else:
+        requested = f"**{random_type}**"
 
-    random_type = random.choice(["insight", "question", "advice"])
     question = f"""
     Today is {date}. The user details are:
     - Name: {user_profile.get('name')}
@@ -865,16 +1351,71 @@ async def get_detail(
     - ID: {user_id}
 
     The user is focusing on the {metric} metric today.
-    Provide a relevant **{random_type}** related to {metric} that is useful for the user.
+    Provide a relevant {requested} related to {metric} that is useful for the user.
     This can be about today, a whole week, month, a few days... but not about the future!
     
     Format the response strictly in JSON!
     """
     
-    response = graph.invoke(
-        {"query_type": "detail", "message": question, "random_type": random_type})
+    response = await graph.ainvoke(
+        {"query_type": "detail", "message": question, "random_type": random_type, "user_id": user_id, "date": date})
     data = parse_response_content(response["answer"])
-
-    if data:
+    if not data:
+        return None
+    if random_type != "all":
         return {"output": data}
+
+    items = {item.get("type"): item for item in data if isinstance(item, dict)} if isinstance(data, list) else {}
+    if set(items) != set(DETAIL_TYPES):
+        return None
+    return {"outputs": [items[detail_type] for detail_type in DETAIL_TYPES]}
+
+
+@router.get("/detail")
+async def get_detail(
+    date: str = Query(..., description="Date in YYYY-MM-DD format"),
+    metric: str = Query(..., description="Metric for the goal, e.g., 'steps'"),
+    user_id: str = Query(..., description="User ID to filter the data"),
+    random_type: Optional[str] = Query(None, description="'insight', 'question' or 'advice'; defaults to a type seeded by user, date and metric"),
+    types: Optional[str] = Query(None, description="'all' to generate an insight, a question and an advice in one run")
+):
+    """
+    Generate a specific 'insight', 'question', or 'advice' for a chosen metric.
+
+    - Uses the requested type, or a default seeded by user, date and metric
+    - With `types=all`, returns all three types in one response (`outputs`)
+    - Serves the nightly precomputed result or a cached response when available
+    - Leverages user's profile and metric focus
+    - Avoids future speculation
+    """
+    if types is not None and types != "all":
+        return {"error": "Invalid types. Valid option: 'all'"}
+    if random_type is not None and random_type not in DETAIL_TYPES:
+        return {"error": f"Invalid random_type. Valid options: {', '.join(DETAIL_TYPES)}"}
+
+    try:
+        user_profile = get_user_info(user_id)
+    except ProfileNotFoundError:
+        return {"error": "User not found"}
+
+    detail_type = "all" if types == "all" else random_type or default_detail_type(user_id, date, metric)
+
+    precomputed = await run_db(load_output, "detail", user_id, date, f"{metric}:{detail_type}")
+    if precomputed is not None:
+        return precomputed
+
+    params = {"date": date, "metric": metric, "user_id": user_id, "type": detail_type}
+    cache_key, cached = await run_db(lookup_response, "detail", user_id, date, params)
+    if cached is not None:
+        return cached
+
+    async def generate_and_cache():
+        result = await generate_detail(user_profile, user_id, date, metric, detail_type)
+        if result:
+            await run_db(store_response, cache_key, "detail", user_id, result, write=True)
+        return result
+
+    result = await generations.run(cache_key, generate_and_cache)
+    if result:
+        return result
     return {"error": "Failed to generate recommendations. Please try again."}
@@ -0,0 +1,125 @@
+"""
+data_context.py — Prefetched data summaries for LLM prompts
+
+The generator endpoints (recommendations, suggested questions, goals, details)
+always need the same slice of a user's data. Instead of letting the SQL agent
+discover the schema and query it over several tool round-trips, this module
+runs those queries directly and renders a compact text summary that is placed
+in the prompt:
+
+- Today's daily totals and the six days before (as one small table)
+- Last night's sleep
+- The most recent completed weekly summaries
+- The user's daily goals
+"""
+
+# Daily columns included in the summary, with the label shown to the LLM
+DAILY_COLUMNS = [
+    ("totalsteps", "steps"),
+    ("totaldistance", "distance_km"),
+    ("calories", "calories_burned"),
+    ("overallactiveminutes", "active_min"),
+    ("veryactiveminutes", "very_active_min"),
+    ("sedentaryminutes", "sedentary_min"),
+    ("total_sleep_minutes", "sleep_min"),
+    ("avg_heart_rate", "avg_hr"),
+    ("weightkg", "weight_kg"),
+]
+
+# Weekly columns included in the summary
+WEEKLY_COLUMNS = [
+    ("totalsteps", "steps"),
+    ("overallactiveminutes", "active_min"),
+    ("calories", "calories_burned"),
+    ("total_sleep_minutes", "sleep_min"),
+    ("avg_heart_rate", "avg_hr"),
+    ("weightkg", "weight_kg"),
+]
+
+# Number of completed weekly summaries included
+WEEKS_IN_CONTEXT = 2
+
+
+def _format_value(value):
+    """Render a value compactly: rounded floats, '-' for missing values."""
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+
+def _table(header, rows):
+    """Render rows as a compact pipe-separated table."""
+    lines = [" | ".join(header)]
+    lines += [" | ".join(_format_value(value) for value in row) for row in rows]
+    return "\n".join(lines)
+
+
+def build_data_context(db, user_id, date):
+    """
+    Collect and summarise the data of `user_id` around `date`.
+
+    Parameters:
+    -----------
+    db : sqlite3.Connection
+        A pooled database connection.
+    user_id : str
+        The user whose data is summarised.
+    date : str
+        The user's "today" (YYYY-MM-DD).
+
+    Returns:
+    --------
+    str
+        A compact multi-section summary, or an empty string if the user has no data for that week.
+    """
+    cursor = db.cursor()
+    cursor.row_factory = None
+
+    daily_select = ", ".join(column for column, _ in DAILY_COLUMNS)
+    cursor.execute(
+        f"SELECT date, {daily_select} FROM daily_data "
+        "WHERE id = ? AND date BETWEEN date(?, '-6 days') AND ? ORDER BY date",
+        (user_id, date, date))
+    daily_rows = cursor.fetchall()
+    if not daily_rows:
+        return ""
+
+    cursor.execute(
+        "SELECT date, asleep_minutes, restless_minutes, awake_minutes, total_minutes_in_bed FROM sleep_data "
+        "WHERE id = ? AND date = date(?, '-1 day')",
+        (user_id, date))
+    sleep_rows = cursor.fetchall()
+
+    weekly_select = ", ".join(column for column, _ in WEEKLY_COLUMNS)
+    cursor.execute(
+        f"SELECT week, {weekly_select} FROM weekly_data "
+        "WHERE id = ? AND substr(week, 12, 10) < ? ORDER BY week DESC LIMIT ?",
+        (user_id, date, WEEKS_IN_CONTEXT))
+    weekly_rows = cursor.fetchall()[::-1]
+
+    cursor.execute("SELECT metric, goal FROM fitness_goals WHERE id = ? ORDER BY metric", (user_id,))
+    goal_rows = cursor.fetchall()
+
+    sections = [
+        f"Today is {date}.",
+        "Daily data for the last 7 days, ordered by date:",
+        _table(["date"] + [label for _, label in DAILY_COLUMNS], daily_rows),
+    ]
+    if sleep_rows:
+        sections += [
+            "Last night's sleep (minutes):",
+            _table(["date", "asleep", "restless", "awake", "in_bed"], sleep_rows),
+        ]
+    if weekly_rows:
+        sections += [
+            "Weekly totals of the last completed weeks:",
+            _table(["week"] + [label for _, label in WEEKLY_COLUMNS], weekly_rows),
+        ]
+    if goal_rows:
+        sections += [
+            "Daily goals (sleep in hours, weight in kg):",
+            _table(["metric", "goal"], goal_rows),
+        ]
+    return "\n\n".join(sections)
@@ -5,7 +5,7 @@ This module contains all FastAPI routes related to accessing and updating fitnes
 
 - Retrieving raw fitness data (daily, weekly, heart rate, etc.) from SQLite
 - Working with fitness goals (get, update, create)
-- Accessing conversation history stored in CSV
+- Accessing conversation history stored in SQLite
 - Updating weight logs across multiple tables
 - Logging UI events such as button clicks for user analytics
 
@@ -13,13 +13,18 @@ These endpoints are mounted under `/data` in the main API application.
 """
 
 from fastapi import APIRouter, Query, Request
-from fastapi.responses import JSONResponse
-import pandas as pd
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException
 from datetime import datetime, timedelta
-from pydantic import BaseModel
-from database import get_db
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from database import run_db
+from series import MEDIA_TYPE as SERIES_MEDIA_TYPE, accepts_series, read_series
+from schema import TABLES
+from response_cache import invalidate_user_responses
+from answer_cache import invalidate_user_answers
+import calendar
 import sqlite3
 import os
 import csv
@@ -37,33 +42,57 @@ VALID_TABLES = [
     "sleep_data"
 ]
 
-# Preload selected CSV files into memory
-dataframes = {
-    "goals": pd.read_csv("data/fitness_goals.csv"),
-    "conversation_subjects": pd.read_csv("data/conversation_subjects.csv", dtype={"user_id": str}, quotechar='"', encoding="utf-8"),
-    "conversation_messages": pd.read_csv("data/conversation_messages.csv", dtype={"user_id": str}, quotechar='"', encoding="utf-8"),
+# Supported heart rate resolutions, expressed as bucket size in minutes
+HEARTRATE_RESOLUTIONS = {"1m": 1, "5m": 5, "15m": 15, "hourly": 60}
+
+# Aggregations and grouping periods supported by the range endpoint
+RANGE_AGGREGATES = {"sum": "SUM", "avg": "AVG", "min": "MIN", "max": "MAX"}
+RANGE_PERIODS = {
+    "day": "date",
+    "week": "date(date, 'weekday 0', '-6 days')",  # Monday of the week
 }
 
-# CSV reload utilities
-def reload_subjects():
-    """Reload the conversation subjects CSV into the in-memory DataFrame."""
-    dataframes["conversation_subjects"] = pd.read_csv(
-        "data/conversation_subjects.csv", dtype={"user_id": str}, quotechar='"', encoding="utf-8")
+# Numeric columns that are identifiers and should never be aggregated
+NON_METRIC_COLUMNS = {"id", "logid", "week_number"}
+
+# Column that orders the rows of a date in the range endpoint's keyset, matching the table's index;
+# tables without an entry use the rowid, which every (id, date) index stores after the date
+RANGE_KEYSET_COLUMNS = {"heartrate_minutes": "minute"}
+
+# Time column of the minute-level datasets that can also be served in the binary series format
+SERIES_TIME_COLUMNS = {"heartrate_minutes": "minute", "minute_sleep": "timestamp"}
 
-def reload_messages():
-    """Reload the conversation messages CSV into the in-memory DataFrame."""
-    dataframes["conversation_messages"] = pd.read_csv(
-        "data/conversation_messages.csv", dtype={"user_id": str}, quotechar='"', encoding="utf-8")
+# Maximum number of queries accepted in one batch request
+MAX_BATCH_QUERIES = 50
 
-def reload_goals():
-    """Reload the fitness goals CSV into the in-memory DataFrame."""
-    dataframes["goals"] = pd.read_csv("data/fitness_goals.csv")
+# Pydantic request models
+class BatchQuery(BaseModel):
+    """One dataset lookup inside a batch request: a single date, a date range, or all rows."""
+    model_config = ConfigDict(extra="forbid")
 
+    dataset: str
+    user_id: int
+    date: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    key: Optional[str] = None
 
-# SQLite fetch utility
-def fetch_from_db(query: str, params: tuple, db=Depends(get_db)):
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery]
+
+# SQLite fetch utilities
+def _fetch_rows(db, query: str, params: tuple):
+    """Execute a query on a pooled connection and return the rows as a list of dicts."""
+    db.row_factory = sqlite3.Row  # Optional: only if not already set
+    cursor = db.cursor()
+    cursor.execute(query, params)
+    records = cursor.fetchall()
+    return [dict(record) for record in records] if records else None
+
+async def fetch_from_db(query: str, params: tuple):
     """
     Run a parameterized query on the SQLite database and return results as a list of dicts.
+    The query runs on the database executor, so the event loop stays free while it executes.
 
     Args:
         query (str): SQL query string with placeholders.
@@ -73,14 +102,21 @@ def fetch_from_db(query: str, params: tuple, db=Depends(get_db)):
         list of dicts or error message.
     """
     try:
-        db.row_factory = sqlite3.Row  # Optional: only if not already set
-        cursor = db.cursor()
-        cursor.execute(query, params)
-        records = cursor.fetchall()
-        return [dict(record) for record in records] if records else None
+        return await run_db(_fetch_rows, query, params)
     except Exception as e:
         return {"error": str(e)}
 
+async def fetch_series_response(query: str, params: tuple, start: int = None, step: int = 60):
+    """
+    Run a query returning `(unix_timestamp, value)` rows and return them in the binary series format.
+    See `series.py` for the layout of the payload.
+    """
+    try:
+        payload = await run_db(read_series, query, params, start, step)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return Response(content=payload, media_type=SERIES_MEDIA_TYPE)
+
 @router.get("/")
 async def root():
     """Root endpoint to verify the data router is active."""
@@ -88,16 +124,21 @@ async def root():
 
 @router.get("/{dataset_name}")
 async def get_data(
+    request: Request,
     dataset_name: str,
-    user_id: int = Query(..., description="User ID to filter the data"),
-    db=Depends(get_db)
+    user_id: int = Query(..., description="User ID to filter the data")
 ):
     """Retrieve data for a specific dataset from the database."""
     if dataset_name not in VALID_TABLES:
         return JSONResponse(content={"error": "Dataset not found"}, status_code=404)
 
+    if dataset_name in SERIES_TIME_COLUMNS and accepts_series(request):
+        time_column = SERIES_TIME_COLUMNS[dataset_name]
+        query = f"SELECT CAST(strftime('%s', {time_column}) AS INTEGER), value FROM {dataset_name} WHERE id = ? ORDER BY {time_column}"
+        return await fetch_series_response(query, (user_id,))
+
     query = f"SELECT * FROM {dataset_name} WHERE id = ?"
-    data = fetch_from_db(query, (user_id,), db=db)
+    data = await fetch_from_db(query, (user_id,))
 
     if not data:
         return JSONResponse(content={"message": f"No data found for user ID {user_id}"}, status_code=404)
@@ -106,17 +147,22 @@ async def get_data(
 
 @router.get("/{dataset_name}/by-date")
 async def get_data_by_date(
+    request: Request,
     dataset_name: str,
     date: str = Query(..., description="The date to filter by (YYYY-MM-DD)"),
-    user_id: int = Query(..., description="User ID to filter the data"),
-    db=Depends(get_db)
+    user_id: int = Query(..., description="User ID to filter the data")
 ):
     """Retrieve data for a given date and user from a dataset."""
     if dataset_name not in VALID_TABLES:
         return JSONResponse(content={"error": "Dataset not found"}, status_code=404)
 
+    if dataset_name in SERIES_TIME_COLUMNS and accepts_series(request):
+        time_column = SERIES_TIME_COLUMNS[dataset_name]
+        query = f"SELECT CAST(strftime('%s', {time_column}) AS INTEGER), value FROM {dataset_name} WHERE id = ? AND date = ? ORDER BY {time_column}"
+        return await fetch_series_response(query, (user_id, date))
+
     query = f"SELECT * FROM {dataset_name} WHERE id = ? AND date = ?"
-    data = fetch_from_db(query, (user_id, date), db=db)
+    data = await fetch_from_db(query, (user_id, date))
 
     if not data:
         return JSONResponse(content={"message": f"No data found for user ID {user_id} on date {date}"}, status_code=404)
@@ -128,8 +174,7 @@ async def get_data_by_date(
 async def get_data_one_week_back(
     dataset_name: str,
     date: str = Query(..., description="End date for the week (YYYY-MM-DD)"),
-    user_id: int = Query(..., description="User ID to filter the data"),
-    db=Depends(get_db)
+    user_id: int = Query(..., description="User ID to filter the data")
 ):
     """Retrieve data for a week ending on a specific date."""
     if dataset_name not in VALID_TABLES:
@@ -141,18 +186,106 @@ async def get_data_one_week_back(
         return JSONResponse(content={"error": "Invalid date format. Use YYYY-MM-DD."}, status_code=400)
 
     week_dates = [(end_date - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-    placeholders = ",".join(["?"] * 7)
 
-    query = f"SELECT * FROM {dataset_name} WHERE id = ? AND date IN ({placeholders})"
-    data = fetch_from_db(query, (user_id, *week_dates), db=db)
+    query = f"SELECT * FROM {dataset_name} WHERE id = ? AND date BETWEEN ? AND ? ORDER BY date"
+    data = await fetch_from_db(query, (user_id, week_dates[-1], week_dates[0]))
 
     return JSONResponse(content={"requested_week": week_dates, "available_data": data if data else []})
 
+@router.get("/{dataset_name}/range")
+async def get_data_in_range(
+    dataset_name: str,
+    start: str = Query(..., description="First date of the range (YYYY-MM-DD)"),
+    end: str = Query(..., description="Last date of the range (YYYY-MM-DD)"),
+    user_id: int = Query(..., description="User ID to filter the data"),
+    aggregate: str = Query(None, description="Optional aggregation per period: sum, avg, min or max"),
+    group_by: str = Query("day", description="Period to aggregate over: day or week"),
+    metrics: str = Query(None, description="Comma-separated columns to aggregate (default: all numeric columns)"),
+    cursor: str = Query(None, description="Pagination cursor returned as 'next_cursor' by the previous page"),
+    limit: int = Query(500, gt=0, le=5000, description="Maximum number of rows per page")
+):
+    """
+    Retrieve data between two dates (inclusive) for a user.
+
+    - Without `aggregate`, rows are returned in date order and paginated with a keyset cursor
+    - With `aggregate`, numeric columns are summarised per day or per week (weeks start on Monday)
+    """
+    if dataset_name not in VALID_TABLES:
+        return JSONResponse(content={"error": "Dataset not found"}, status_code=404)
+
+    columns = dict(TABLES.get(dataset_name, []))
+    if "date" not in columns:
+        return JSONResponse(content={"error": f"Dataset '{dataset_name}' has no date column"}, status_code=400)
+
+    try:
+        datetime.strptime(start, "%Y-%m-%d")
+        datetime.strptime(end, "%Y-%m-%d")
+    except ValueError:
+        return JSONResponse(content={"error": "Invalid date format. Use YYYY-MM-DD."}, status_code=400)
+
+    if aggregate is not None:
+        if aggregate not in RANGE_AGGREGATES or group_by not in RANGE_PERIODS:
+            return JSONResponse(content={"error": f"Invalid aggregation. Use aggregate={'/'.join(RANGE_AGGREGATES)} and group_by={'/'.join(RANGE_PERIODS)}."}, status_code=400)
+
+        numeric_columns = [name for name, column_type in columns.items()
+                           if column_type in ("INTEGER", "REAL") and name not in NON_METRIC_COLUMNS]
+        selected = [name.strip() for name in metrics.split(",")] if metrics else numeric_columns
+        unknown = [name for name in selected if name not in numeric_columns]
+        if unknown:
+            return JSONResponse(content={"error": f"Cannot aggregate columns: {', '.join(unknown)}"}, status_code=400)
+
+        function = RANGE_AGGREGATES[aggregate]
+        period = RANGE_PERIODS[group_by]
+        aggregates = ", ".join(f"{function}({name}) AS {name}" for name in selected)
+        query = f"""
+            SELECT {period} AS period, COUNT(*) AS row_count, {aggregates}
+            FROM {dataset_name}
+            WHERE id = ? AND date BETWEEN ? AND ?
+            GROUP BY period
+            ORDER BY period
+        """
+        data = await fetch_from_db(query, (user_id, start, end))
+        if isinstance(data, dict) and "error" in data:
+            return JSONResponse(content=data, status_code=400)
+
+        return JSONResponse(content={"start": start, "end": end, "aggregate": aggregate,
+                                     "group_by": group_by, "data": data if data else []})
+
+    # Keyset pagination on (date, key column), which follows the order of the table's index,
+    # so a page is read straight from the index without sorting the range
+    key_column = RANGE_KEYSET_COLUMNS.get(dataset_name, "rowid")
+    params = [user_id, start, end]
+    keyset = ""
+    if cursor:
+        try:
+            after_date, after_key = cursor.split("|", 1)
+            params += [after_date, after_date, int(after_key) if key_column == "rowid" else after_key]
+        except ValueError:
+            return JSONResponse(content={"error": "Invalid cursor"}, status_code=400)
+        keyset = f"AND (date > ? OR (date = ? AND {key_column} > ?))"
+
+    query = f"""
+        SELECT {key_column} AS row_key, *
+        FROM {dataset_name}
+        WHERE id = ? AND date BETWEEN ? AND ? {keyset}
+        ORDER BY date, {key_column}
+        LIMIT ?
+    """
+    data = await fetch_from_db(query, (*params, limit))
+    if isinstance(data, dict) and "error" in data:
+        return JSONResponse(content=data, status_code=400)
+
+    data = data if data else []
+    next_cursor = f"{data[-1]['date']}|{data[-1]['row_key']}" if len(data) == limit else None
+    for record in data:
+        record.pop("row_key")
+
+    return JSONResponse(content={"start": start, "end": end, "data": data, "next_cursor": next_cursor})
+
 @router.get("/daily_data/sleep-week-back")
 async def get_sleep_data_one_week_back(
     date: str = Query(..., description="End date for the week (YYYY-MM-DD)"),
-    user_id: int = Query(..., description="User ID to filter the data"),
-    db=Depends(get_db)
+    user_id: int = Query(..., description="User ID to filter the data")
 ):
     """Retrieve total sleep minutes for a user across the last 7 days."""
     try:
@@ -161,39 +294,81 @@ async def get_sleep_data_one_week_back(
         return JSONResponse(content={"error": "Invalid date format. Use YYYY-MM-DD."}, status_code=400)
 
     week_dates = [(end_date - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-    placeholders = ",".join(["?"] * 7)
 
-    query = f"SELECT * FROM daily_data WHERE id = ? AND date IN ({placeholders})"
-    data = fetch_from_db(query, (user_id, *week_dates), db=db)
+    query = f"SELECT * FROM daily_data WHERE id = ? AND date BETWEEN ? AND ? ORDER BY date"
+    data = await fetch_from_db(query, (user_id, week_dates[-1], week_dates[0]))
 
     return JSONResponse(content={"available_sleep_data": data if data else []})
 
 
 @router.get("/heartrate/minute")
 async def get_heartrate_data_by_date(
+    request: Request,
     bydate: str = Query(..., description="Date for which to retrieve heart rate data (YYYY-MM-DD)"),
     user_id: int = Query(..., description="User ID to filter the data"),
-    db=Depends(get_db)
+    resolution: str = Query("1m", description="Bucket size for the values: 1m, 5m, 15m or hourly")
 ):
-    """Retrieve minute-level heart rate values for a specific date."""
-    
-    query = "SELECT value FROM heartrate_minutes WHERE id = ? AND strftime('%Y-%m-%d', minute) = ?"
-    data = fetch_from_db(query, (user_id, bydate), db=db)
+    """
+    Retrieve minute-level heart rate values for a specific date, optionally averaged per bucket.
+    Averaged values hold one slot per bucket from midnight, null for buckets without a reading.
+    Clients sending `Accept: application/x-fitness-series` receive the values in the binary series format.
+    """
+    if resolution not in HEARTRATE_RESOLUTIONS:
+        return JSONResponse(content={"error": f"Invalid resolution. Use one of: {', '.join(HEARTRATE_RESOLUTIONS)}."}, status_code=400)
+
+    try:
+        day_start = calendar.timegm(datetime.strptime(bydate, "%Y-%m-%d").timetuple())
+    except ValueError:
+        return JSONResponse(content={"error": "Invalid date format. Use YYYY-MM-DD."}, status_code=400)
+
+    bucket_minutes = HEARTRATE_RESOLUTIONS[resolution]
+    step = bucket_minutes * 60
+    if bucket_minutes == 1:
+        query = """
+            SELECT CAST(strftime('%s', minute) AS INTEGER) AS epoch, value
+            FROM heartrate_minutes
+            WHERE id = ? AND date = ?
+            ORDER BY minute
+        """
+        params = (user_id, bydate)
+    else:
+        # Downsample in SQL: average the readings per bucket of minutes since midnight.
+        # Minutes without a reading are stored as 0 and left out; buckets without any reading are NULL.
+        query = """
+            SELECT MIN(CAST(strftime('%s', minute) AS INTEGER)) / ? * ? AS epoch,
+                   CAST(ROUND(AVG(NULLIF(value, 0))) AS INTEGER) AS value
+            FROM heartrate_minutes
+            WHERE id = ? AND date = ?
+            GROUP BY (CAST(substr(minute, 12, 2) AS INTEGER) * 60 + CAST(substr(minute, 15, 2) AS INTEGER)) / ?
+            ORDER BY MIN(minute)
+        """
+        params = (step, step, user_id, bydate, bucket_minutes)
+
+    if accepts_series(request):
+        return await fetch_series_response(query, params, start=day_start, step=step)
+
+    data = await fetch_from_db(query, params)
 
     if isinstance(data, dict) and "error" in data:
         return JSONResponse(content=data, status_code=400)
     
     if not data:
-        return JSONResponse(content={"date": bydate, "heart_rate_values": []})
+        return JSONResponse(content={"date": bydate, "resolution": resolution, "heart_rate_values": []})
 
-    heart_rate_values = [record["value"] for record in data]
-    return JSONResponse(content={"date": bydate, "heart_rate_values": heart_rate_values})
+    if bucket_minutes == 1:
+        heart_rate_values = [record["value"] for record in data]
+    else:
+        # One slot per bucket from midnight, null for buckets without a reading
+        heart_rate_values = [None] * ((data[-1]["epoch"] - day_start) // step + 1)
+        for record in data:
+            heart_rate_values[(record["epoch"] - day_start) // step] = record["value"]
+    return JSONResponse(content={"date": bydate, "resolution": resolution, "heart_rate_values": heart_rate_values})
 
 @router.get("/goals/{user_id}")
-async def get_goals_by_id(user_id: int, db=Depends(get_db)):
+async def get_goals_by_id(user_id: int):
     """Retrieve all fitness goals for a specific user."""
     query = "SELECT * FROM fitness_goals WHERE id = ?"
-    data = fetch_from_db(query, (user_id,), db=db)
+    data = await fetch_from_db(query, (user_id,))
 
     if data is None:
         return JSONResponse(content={"message": f"No goals found for user ID {user_id}"}, status_code=404)
@@ -201,38 +376,46 @@ async def get_goals_by_id(user_id: int, db=Depends(get_db)):
     return JSONResponse(content=data)
 
 @router.get("/goals/{user_id}/{goal_metric}")
-async def get_specific_goal(user_id: int, goal_metric: str, db=Depends(get_db)):
+async def get_specific_goal(user_id: int, goal_metric: str):
     """Retrieve a specific fitness goal for a given user ID and metric."""
     query = "SELECT * FROM fitness_goals WHERE id = ? AND metric = ?"
-    data = fetch_from_db(query, (user_id, goal_metric), db=db)
+    data = await fetch_from_db(query, (user_id, goal_metric))
 
     if data is None:
         return JSONResponse(content={"message": f"No goal found for user ID {user_id} and metric '{goal_metric}'"}, status_code=404)
 
     return JSONResponse(content=data[0])
 
+def _write_goal(db, user_id: int, goal_metric: str, goal_value: int):
+    """Update or insert a goal row on a pooled write connection and return a status message."""
+    cursor = db.cursor()
+    # Check if goal exists
+    check_query = "SELECT * FROM fitness_goals WHERE id = ? AND metric = ?"
+    cursor.execute(check_query, (user_id, goal_metric))
+    existing_goal = cursor.fetchone()
+
+    if existing_goal:
+        # Update existing goal
+        update_query = "UPDATE fitness_goals SET goal = ? WHERE id = ? AND metric = ?"
+        cursor.execute(update_query, (goal_value, user_id, goal_metric))
+        message = f"Updated goal for user ID {user_id} and metric '{goal_metric}' to {goal_value}."
+    else:
+        # Insert new goal
+        insert_query = "INSERT INTO fitness_goals (id, metric, goal) VALUES (?, ?, ?)"
+        cursor.execute(insert_query, (user_id, goal_metric, goal_value))
+        message = f"Created new goal for user ID {user_id} and metric '{goal_metric}' with value {goal_value}."
+
+    # In the same transaction, so no reader can cache an answer for the new data in between
+    invalidate_user_responses(db, user_id)
+    invalidate_user_answers(db, user_id)
+    db.commit()
+    return message
+
 @router.post("/goals/{user_id}/{goal_metric}")
-async def update_goal(user_id: int, goal_metric: str, goal_value: int, db = Depends(get_db)):
+async def update_goal(user_id: int, goal_metric: str, goal_value: int):
     """Update or create a fitness goal for a specific user and metric."""
     try:
-        cursor = db.cursor()
-        # Check if goal exists
-        check_query = "SELECT * FROM fitness_goals WHERE id = ? AND metric = ?"
-        cursor.execute(check_query, (user_id, goal_metric))
-        existing_goal = cursor.fetchone()
-
-        if existing_goal:
-            # Update existing goal
-            update_query = "UPDATE fitness_goals SET goal = ? WHERE id = ? AND metric = ?"
-            cursor.execute(update_query, (goal_value, user_id, goal_metric))
-            message = f"Updated goal for user ID {user_id} and metric '{goal_metric}' to {goal_value}."
-        else:
-            # Insert new goal
-            insert_query = "INSERT INTO fitness_goals (id, metric, goal) VALUES (?, ?, ?)"
-            cursor.execute(insert_query, (user_id, goal_metric, goal_value))
-            message = f"Created new goal for user ID {user_id} and metric '{goal_metric}' with value {goal_value}."
-
-        db.commit()
+        message = await run_db(_write_goal, user_id, goal_metric, goal_value, write=True)
         return {"message": message}
 
     except sqlite3.Error as e:
@@ -240,27 +423,33 @@ async def update_goal(user_id: int, goal_metric: str, goal_value: int, db = Depe
 
 @router.get("/conversation_subjects/{user_id}")
 async def get_conversation_subjects(user_id: str, offset: int = Query(0, ge=0), limit: int = Query(5, gt=0)):
-    """Retrieve paginated conversation subjects for a given user."""
-    if "conversation_subjects" not in dataframes:
-        return JSONResponse(content={"error": "Conversation subjects dataset not found"}, status_code=404)
-    
-    subjects_df = dataframes["conversation_subjects"]
-    
-    if "user_id" not in subjects_df.columns:
-        return JSONResponse(content={"error": "The 'conversation_subjects' dataset does not have the required column 'user_id'"}, status_code=400)
-    
-    user_subjects = subjects_df[subjects_df["user_id"] == user_id]
-    
-    if user_subjects.empty:
+    """Retrieve paginated conversation subjects for a given user, newest first."""
+    count = await fetch_from_db("SELECT COUNT(*) AS total FROM conversation_subjects WHERE user_id = ?", (user_id,))
+    if isinstance(count, dict) and "error" in count:
+        return JSONResponse(content=count, status_code=400)
+
+    total = count[0]["total"]
+    if total == 0:
         return JSONResponse(content={"message": f"No conversation subjects found for user ID {user_id}"}, status_code=404)
-    
-    user_subjects["subject"] = user_subjects["subject"].str.strip('"')
-    user_subjects = user_subjects.sort_values(by="timestamp", ascending=False)
-    paginated_subjects = user_subjects.iloc[offset:offset + limit]
-    
+
+    query = """
+        SELECT conversation_id, user_id, subject, timestamp
+        FROM conversation_subjects
+        WHERE user_id = ?
+        ORDER BY timestamp DESC
+        LIMIT ? OFFSET ?
+    """
+    subjects = await fetch_from_db(query, (user_id, limit, offset))
+    if isinstance(subjects, dict) and "error" in subjects:
+        return JSONResponse(content=subjects, status_code=400)
+
+    subjects = subjects if subjects else []
+    for subject in subjects:
+        subject["subject"] = (subject["subject"] or "").strip('"')
+
     return {
-        "conversations": paginated_subjects.to_dict(orient="records"),
-        "total": len(user_subjects),
+        "conversations": subjects,
+        "total": total,
         "offset": offset,
         "limit": limit
     }
@@ -268,27 +457,58 @@ async def get_conversation_subjects(user_id: str, offset: int = Query(0, ge=0),
 @router.get("/conversation_messages/{conversation_id}")
 async def get_conversation_messages(conversation_id: str):
     """Retrieve messages for a specific conversation."""
-    if "conversation_messages" not in dataframes:
-        return JSONResponse(content={"error": "Conversation messages dataset not found"}, status_code=404)
-    
-    messages_df = dataframes["conversation_messages"]
-    
-    if "conversation_id" not in messages_df.columns:
-        return JSONResponse(content={"error": "The 'conversation_messages' dataset does not have the required column 'conversation_id'"}, status_code=400)
-    
-    conversation_msgs = messages_df[messages_df["conversation_id"] == conversation_id]
-    
-    if conversation_msgs.empty:
+    query = """
+        SELECT conversation_id, user_id, role, message, timestamp
+        FROM conversation_messages
+        WHERE conversation_id = ?
+        ORDER BY message_id
+    """
+    messages = await fetch_from_db(query, (conversation_id,))
+
+    if isinstance(messages, dict) and "error" in messages:
+        return JSONResponse(content=messages, status_code=400)
+
+    if not messages:
         return JSONResponse(content={"message": f"No conversation messages found for conversation ID {conversation_id}"}, status_code=404)
-    
-    return conversation_msgs.to_dict(orient="records")
+
+    return messages
+
+def _write_weight(db, user_id: int, weight: float, date: str):
+    """Update the weight in both weight_log and daily_data on a pooled write connection."""
+    cursor = db.cursor()
+
+    cursor.execute("SELECT * FROM weight_log WHERE id = ? AND date = ?", (user_id, date))
+    weight_log_entry = cursor.fetchone()
+
+    if weight_log_entry:
+        cursor.execute(
+            "UPDATE weight_log SET weightkg = ? WHERE id = ? AND date = ?",
+            (weight, user_id, date)
+        )
+    else:
+        raise HTTPException(status_code=404, detail="No matching weight log entry found for the specified user and date.")
+
+    cursor.execute("SELECT * FROM daily_data WHERE id = ? AND date = ?", (user_id, date))
+    daily_data_entry = cursor.fetchone()
+
+    if daily_data_entry:
+        cursor.execute(
+            "UPDATE daily_data SET weightkg = ? WHERE id = ? AND date = ?",
+            (weight, user_id, date)
+        )
+    else:
+        raise HTTPException(status_code=404, detail="No matching daily data entry found for the specified user and date.")
+
+    # In the same transaction, so no reader can cache an answer for the new data in between
+    invalidate_user_responses(db, user_id)
+    invalidate_user_answers(db, user_id)
+    db.commit()
 
 @router.post("/weight_log/update_weight/{user_id}")
 async def update_weight_log_entry(
     user_id: int,
     weight: float,
-    date: str = Query(..., description="Date for which to update the weight (YYYY-MM-DD)"),
-    db = Depends(get_db)
+    date: str = Query(..., description="Date for which to update the weight (YYYY-MM-DD)")
 ):
     """Update weight data for a user and date in both weight_log and daily_data tables."""
     try:
@@ -297,35 +517,74 @@ async def update_weight_log_entry(
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
     try:
-        cursor = db.cursor()
-        
-        cursor.execute("SELECT * FROM weight_log WHERE id = ? AND date = ?", (user_id, date))
-        weight_log_entry = cursor.fetchone()
-
-        if weight_log_entry:
-            cursor.execute(
-                "UPDATE weight_log SET weightkg = ? WHERE id = ? AND date = ?",
-                (weight, user_id, date)
-            )
-        else:
-            raise HTTPException(status_code=404, detail="No matching weight log entry found for the specified user and date.")
+        await run_db(_write_weight, user_id, weight, date, write=True)
+        return {"message": "Weight log and daily data entry updated successfully."}
 
-        cursor.execute("SELECT * FROM daily_data WHERE id = ? AND date = ?", (user_id, date))
-        daily_data_entry = cursor.fetchone()
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        if daily_data_entry:
-            cursor.execute(
-                "UPDATE daily_data SET weightkg = ? WHERE id = ? AND date = ?",
-                (weight, user_id, date)
-            )
+def _fetch_batch(db, statements):
+    """
+    Run several queries inside one read transaction on a pooled connection.
+    In WAL mode every query therefore sees the same snapshot of the database.
+    """
+    cursor = db.cursor()
+    cursor.execute("BEGIN")
+    try:
+        results = []
+        for query, params in statements:
+            cursor.execute(query, params)
+            results.append([dict(record) for record in cursor.fetchall()])
+        return results
+    finally:
+        db.rollback()
+
+@router.post("/batch")
+async def get_data_batch(request: BatchRequest):
+    """
+    Retrieve several datasets in one request, e.g. everything the dashboard needs on startup.
+
+    - Each query selects one date (`date`), an inclusive range (`start` + `end`) or all rows of a user
+    - All queries read from the same database snapshot
+    - Results are keyed by the query's `key`, or by `dataset:user_id:date` when no key is given;
+      keys must be unique
+    """
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        return JSONResponse(content={"error": f"A batch can contain at most {MAX_BATCH_QUERIES} queries"}, status_code=400)
+
+    keys = []
+    statements = []
+    for spec in request.queries:
+        if spec.dataset not in VALID_TABLES:
+            return JSONResponse(content={"error": f"Dataset '{spec.dataset}' not found"}, status_code=404)
+
+        if spec.date is not None:
+            query = f"SELECT * FROM {spec.dataset} WHERE id = ? AND date = ?"
+            params = (spec.user_id, spec.date)
+            period = spec.date
+        elif spec.start is not None and spec.end is not None:
+            query = f"SELECT * FROM {spec.dataset} WHERE id = ? AND date BETWEEN ? AND ? ORDER BY date"
+            params = (spec.user_id, spec.start, spec.end)
+            period = f"{spec.start}..{spec.end}"
+        elif spec.start is None and spec.end is None:
+            query = f"SELECT * FROM {spec.dataset} WHERE id = ?"
+            params = (spec.user_id,)
+            period = "all"
         else:
-            raise HTTPException(status_code=404, detail="No matching daily data entry found for the specified user and date.")
+            return JSONResponse(content={"error": "A date range needs both 'start' and 'end'"}, status_code=400)
 
-        db.commit()
-        return {"message": "Weight log and daily data entry updated successfully."}
+        key = spec.key or f"{spec.dataset}:{spec.user_id}:{period}"
+        if key in keys:
+            return JSONResponse(content={"error": f"Duplicate key '{key}'"}, status_code=400)
+        keys.append(key)
+        statements.append((query, params))
 
+    try:
+        results = await run_db(_fetch_batch, statements)
     except sqlite3.Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    return JSONResponse(content={"results": dict(zip(keys, results))})
 
 @router.post("/log-click")
 async def log_click(request: Request):
@@ -1,44 +1,158 @@
 """
 database.py — SQLite database configuration and utility functions
 
-This module sets up a shared SQLite database connection for use in the API.
+This module sets up a bounded pool of SQLite connections for use in the API.
+Every connection runs in WAL journal mode with a busy timeout, so readers can
+work on their own connection while writers are serialized through a single lock.
+Async routes run their queries on a dedicated executor through `run_db`, so a slow
+query never blocks the event loop.
 It also includes a helper function to retrieve the schema of the database,
 which can be used for inspection, validation, or prompting in LLM workflows.
 """
 
+import asyncio
+import queue
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 
 # Set the database path
 DATABASE_PATH = "data/fitness.db"
 
-# Initialize a single database connection
-db_connection = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
-db_connection.row_factory = sqlite3.Row  # Allows column access by name
+# Pool configuration
+POOL_SIZE = 8                # Maximum number of open connections
+POOL_TIMEOUT = 10            # Seconds to wait for a free connection
+BUSY_TIMEOUT_MS = 5000       # How long SQLite waits on a locked database
 
-def get_schema():
-    """Retrieve the table schema from SQLite database."""
-    cursor = db_connection.cursor()
 
-    # Get all table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
+def create_connection(database_path=DATABASE_PATH, read_only=False):
+    """
+    Open a new SQLite connection configured for concurrent use.
+    Read-only connections open the file in `mode=ro`, so no statement can modify it.
+    """
+    if read_only:
+        connection = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        connection = sqlite3.connect(database_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL;")
+    connection.row_factory = sqlite3.Row  # Allows column access by name
+    connection.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+    return connection
 
-    # For each table, retrieve its column names
-    table_info = {}
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        table_info[table_name] = [column[1] for column in columns]
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections.
+
+    Connections are opened lazily up to `size`. When every connection is in use,
+    callers wait up to `timeout` seconds for one to be returned. Writers additionally
+    hold `write_lock`, so only one write transaction is active at a time.
+    """
+
+    def __init__(self, database_path=DATABASE_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT, read_only=False):
+        self.database_path = database_path
+        self.read_only = read_only
+        self.size = size
+        self.timeout = timeout
+        self.write_lock = threading.Lock()
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._open_lock = threading.Lock()
+
+    def acquire(self):
+        """Take an idle connection from the pool, opening a new one if allowed."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._open_lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return create_connection(self.database_path, read_only=self.read_only)
+                except sqlite3.Error:
+                    self._opened -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+    def release(self, connection):
+        """Return a connection to the pool, rolling back any unfinished transaction."""
+        if connection.in_transaction:
+            connection.rollback()
+        self._idle.put_nowait(connection)
+
+    @contextmanager
+    def connection(self, write=False):
+        """
+        Borrow a connection for the duration of a `with` block.
+        Writers take `write_lock` before the connection, so waiting writers hold no pool slot.
+        """
+        with self.write_lock if write else nullcontext():
+            connection = self.acquire()
+            try:
+                yield connection
+            finally:
+                self.release(connection)
+
+    def close(self):
+        """Close every idle connection held by the pool."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._open_lock:
+                self._opened -= 1
+
+
+# Initialize the shared connection pool
+pool = ConnectionPool()
+
+# Dedicated worker threads for database access, one per pooled connection
+executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="sqlite")
+
+
+async def run_db(func, *args, write=False):
+    """
+    Run `func(connection, *args)` on the database executor and await its result.
+
+    The function receives a pooled connection; set `write=True` for functions that
+    modify the database so they are serialized with other writers.
+    """
+    def task():
+        with pool.connection(write=write) as connection:
+            return func(connection, *args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, task)
+
+def get_schema(tables=None):
+    """Retrieve the table schema from SQLite database, optionally limited to the given table names."""
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+
+        # Get all table names
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+        table_rows = cursor.fetchall()
+
+        # For each table, retrieve its column names
+        table_info = {}
+        for table in table_rows:
+            table_name = table[0]
+            if tables is not None and table_name not in tables:
+                continue
+            cursor.execute(f"PRAGMA table_info({table_name});")
+            columns = cursor.fetchall()
+            table_info[table_name] = [column[1] for column in columns]
 
     # Build the schema string
     schema_string = "\n".join([f"{table}: {', '.join(columns)}" for table, columns in table_info.items()])
 
-    return schema_string 
-
-# Dependency to get the shared database connection
-def get_db():
-    try:
-        yield db_connection
-    finally:
-        pass 
\ No newline at end of file
+    return schema_string
@@ -0,0 +1,246 @@
+"""
+llm_provider.py — Configurable backend for the chatbot's LLM calls
+
+The chatbot always talks to its LLM through `ChatOpenAI`. This module decides
+where those OpenAI chat-completions requests go, based on the `LLM_PROVIDER`
+environment variable:
+
+- `openai` (default): the OpenAI API
+- `record`: the OpenAI API, appending every request/response pair to `LLM_RECORDINGS_FILE`
+- `replay`: answers from `LLM_RECORDINGS_FILE` only; unrecorded requests fail
+- `stub`: a local, deterministic stand-in that answers after `LLM_STUB_LATENCY_MS`
+
+The last three are implemented as httpx transports that speak the chat-completions
+protocol (including streaming and tool calls), so the chat graph, the agent loop and
+the endpoints run unchanged and can be benchmarked without network access or tokens.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+# Load environment variables from the .env file (OPENAI_API_KEY, LLM_*)
+load_dotenv()
+
+# Selected backend and model
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+# File with recorded request/response pairs, one JSON object per line
+LLM_RECORDINGS_FILE = os.getenv("LLM_RECORDINGS_FILE", "data/llm_recordings.jsonl")
+
+# Simulated response time of the stub
+LLM_STUB_LATENCY_MS = int(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+
+# Answers returned by the stub once no tool has to be called; the JSON one when the prompt asks for JSON
+STUB_REPLY = "This is a stub response."
+STUB_JSON_REPLY = json.dumps({"response": STUB_REPLY})
+
+# Base URL used for the local backends; requests never leave the process
+LOCAL_BASE_URL = "http://llm.local/v1"
+
+# Connection limits of the shared HTTP clients
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+HTTP_TIMEOUT = 120
+
+
+def request_key(request):
+    """Identify a chat-completions request by a hash of its JSON body."""
+    body = json.loads(request.content or b"{}")
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _json_response(status_code, payload):
+    return httpx.Response(status_code, json=payload)
+
+
+def _completion_chunks(completion):
+    """Convert a chat completion into the server-sent events of a streamed response."""
+    choice = completion["choices"][0]
+    message = choice["message"]
+    delta = {"role": "assistant", "content": message.get("content") or ""}
+    if message.get("tool_calls"):
+        delta["tool_calls"] = [dict(call, index=index) for index, call in enumerate(message["tool_calls"])]
+
+    chunk = {key: completion[key] for key in ("id", "created", "model")}
+    chunk["object"] = "chat.completion.chunk"
+    events = [
+        dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}]),
+        dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": choice["finish_reason"]}]),
+        dict(chunk, choices=[], usage=completion["usage"]),
+    ]
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body.encode("utf-8"))
+
+
+class StubTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Local chat-completions endpoint with a fixed latency and deterministic answers.
+
+    When the request offers tools and no tool has been called yet, the stub calls
+    the first tool without required arguments, so agent requests go through one
+    tool round-trip. Otherwise it answers with `STUB_REPLY`, or `STUB_JSON_REPLY`
+    when the user's prompt asks for JSON.
+    """
+
+    def __init__(self, latency_ms=LLM_STUB_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _completion(self, body):
+        with self._lock:
+            self._count += 1
+            number = self._count
+
+        messages = body.get("messages", [])
+        tool = None
+        if messages and messages[-1].get("role") != "tool":
+            tool = next((tool["function"] for tool in body.get("tools", [])
+                         if not tool["function"].get("parameters", {}).get("required")), None)
+
+        if tool is not None:
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_stub_{number}",
+                "type": "function",
+                "function": {"name": tool["name"], "arguments": "{}"},
+            }]}
+            finish_reason = "tool_calls"
+        else:
+            prompt = next((message.get("content") or "" for message in reversed(messages)
+                           if message.get("role") == "user"), "")
+            wants_json = isinstance(prompt, str) and "json" in prompt.lower()
+            message = {"role": "assistant", "content": STUB_JSON_REPLY if wants_json else STUB_REPLY}
+            finish_reason = "stop"
+
+        prompt_tokens = len(json.dumps(messages)) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return {
+            "id": f"chatcmpl-stub-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", LLM_MODEL),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _respond(self, request):
+        body = json.loads(request.content or b"{}")
+        completion = self._completion(body)
+        if body.get("stream"):
+            return _completion_chunks(completion)
+        return _json_response(200, completion)
+
+    def handle_request(self, request):
+        time.sleep(self.latency)
+        return self._respond(request)
+
+    async def handle_async_request(self, request):
+        await asyncio.sleep(self.latency)
+        return self._respond(request)
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Answers requests with the responses recorded by `RecordingTransport`."""
+
+    def __init__(self, path=LLM_RECORDINGS_FILE):
+        self.recordings = {}
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    recording = json.loads(line)
+                    self.recordings[recording["key"]] = recording
+
+    def _respond(self, request):
+        recording = self.recordings.get(request_key(request))
+        if recording is None:
+            # 400 instead of 5xx, so the OpenAI client does not retry
+            return _json_response(400, {"error": {"message": "No recorded response for this request", "type": "replay_miss"}})
+        return httpx.Response(
+            recording["status_code"],
+            headers={"content-type": recording["content_type"]},
+            content=recording["body"].encode("utf-8"))
+
+    def handle_request(self, request):
+        return self._respond(request)
+
+    async def handle_async_request(self, request):
+        return self._respond(request)
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Forwards requests to the API and appends each request/response pair to a recordings file."""
+
+    def __init__(self, path=LLM_RECORDINGS_FILE):
+        self.path = path
+        self._transport = httpx.HTTPTransport(limits=HTTP_LIMITS)
+        self._async_transport = httpx.AsyncHTTPTransport(limits=HTTP_LIMITS)
+        self._lock = threading.Lock()
+
+    def _record(self, request, response):
+        # The body is stored decoded, so the encoding headers no longer apply
+        recorded = httpx.Response(
+            response.status_code,
+            headers={"content-type": response.headers.get("content-type", "application/json")},
+            content=response.content)
+        if response.status_code == 200:
+            line = json.dumps({
+                "key": request_key(request),
+                "status_code": response.status_code,
+                "content_type": recorded.headers["content-type"],
+                "body": response.text,
+            })
+            with self._lock, open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        return recorded
+
+    def handle_request(self, request):
+        response = self._transport.handle_request(request)
+        response.read()
+        return self._record(request, response)
+
+    async def handle_async_request(self, request):
+        response = await self._async_transport.handle_async_request(request)
+        await response.aread()
+        return self._record(request, response)
+
+
+def create_http_clients(provider=LLM_PROVIDER):
+    """Create the sync and async HTTP clients for `provider`, shared by all models."""
+    if provider == "openai":
+        return (httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+                httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT))
+
+    transports = {"record": RecordingTransport, "replay": ReplayTransport, "stub": StubTransport}
+    if provider not in transports:
+        raise ValueError(f"Unknown LLM_PROVIDER '{provider}'. Valid options: openai, {', '.join(transports)}")
+    transport = transports[provider]()
+    return (httpx.Client(transport=transport, timeout=HTTP_TIMEOUT),
+            httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT))
+
+
+# Shared HTTP clients, so every LLM call reuses pooled connections (or the same local transport)
+http_client, http_async_client = create_http_clients()
+
+
+def create_chat_model(temperature=0.3):
+    """Create a chat model for the configured provider, using the shared HTTP clients."""
+    local = LLM_PROVIDER in ("replay", "stub")
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=temperature,
+        api_key=os.getenv("OPENAI_API_KEY") or ("local" if local else None),
+        base_url=LOCAL_BASE_URL if local else None,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
@@ -9,6 +9,11 @@ This FastAPI application serves two main purposes:
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from schema import migrate
+
+# Build or upgrade data/fitness.db before the routers read its schema
+migrate()
+
 from data_endpoints import router as data_router # Endpoint for fitness data access
 from chatbot_endpoints_sql import router as chat_router # Endpoint for chatbot communication
 
@@ -0,0 +1,286 @@
+"""
+metric_tools.py — Typed metric queries exposed to the chatbot agent as tools
+
+Most chat questions ask for the same few things: a day's totals, a comparison
+of two days, the weekly trend, last night's sleep or the heart rate of a day.
+Instead of writing SQL for these through several tool round-trips, the agent
+can call one of these tools, each running fixed, indexed queries and returning
+a compact aggregate:
+
+- `get_day_summary`: totals of one day, with the user's goals
+- `compare_days`: two days side by side, with the differences
+- `weekly_trend`: the last weekly summaries, with the change per week
+- `sleep_stages_for_night`: asleep/restless/awake minutes, bedtime and wake time of a night
+- `hr_zones_for_day`: minutes per heart rate zone of a day
+
+Like `sql_tool.py`, the user ID comes from the run's config, and the queries run on
+its user-scoped read-only connections with the same timeout. Errors, including
+database errors, are returned to the agent as `{"error": ...}`. Free SQL (`sql_db_query`) remains the fallback for other questions.
+"""
+
+import sqlite3
+from datetime import date as date_type, timedelta
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+from profiles import profiles, ProfileError
+from sql_tool import QUERY_TIMEOUT_SECONDS, query_deadline, scoped_connection
+
+# Daily columns in a day summary, with the name shown to the agent
+DAY_SUMMARY_COLUMNS = [
+    ("totalsteps", "steps"),
+    ("totaldistance", "distance_km"),
+    ("calories", "calories"),
+    ("overallactiveminutes", "active_minutes"),
+    ("veryactiveminutes", "very_active_minutes"),
+    ("fairlyactiveminutes", "fairly_active_minutes"),
+    ("lightlyactiveminutes", "lightly_active_minutes"),
+    ("sedentaryminutes", "sedentary_minutes"),
+    ("total_sleep_minutes", "sleep_minutes"),
+    ("min_heart_rate", "min_heart_rate"),
+    ("avg_heart_rate", "avg_heart_rate"),
+    ("max_heart_rate", "max_heart_rate"),
+    ("weightkg", "weight_kg"),
+]
+
+# Weekly columns in the weekly trend
+WEEKLY_TREND_COLUMNS = [
+    ("totalsteps", "steps"),
+    ("totaldistance", "distance_km"),
+    ("overallactiveminutes", "active_minutes"),
+    ("calories", "calories"),
+    ("total_sleep_minutes", "sleep_minutes"),
+    ("avg_heart_rate", "avg_heart_rate"),
+    ("weightkg", "weight_kg"),
+]
+
+# Goal metrics compared with a day summary: goal metric -> (summary field, factor from summary unit to goal unit)
+GOAL_FIELDS = {
+    "steps": ("steps", 1),
+    "calories": ("calories", 1),
+    "active_minutes": ("active_minutes", 1),
+    "sleep": ("sleep_minutes", 1 / 60),  # Sleep goals are in hours
+}
+
+# Heart rate zones as fractions of the maximum heart rate (220 - age)
+HR_ZONES = [
+    ("below_zone_1", 0.0),
+    ("zone_1_very_light", 0.5),
+    ("zone_2_light", 0.6),
+    ("zone_3_moderate", 0.7),
+    ("zone_4_hard", 0.8),
+    ("zone_5_maximum", 0.9),
+]
+
+# Maximum heart rate used when the user's age is unknown
+DEFAULT_MAX_HEART_RATE = 190
+
+# Minute sleep values
+SLEEP_STAGES = {1: "asleep", 2: "restless", 3: "awake"}
+
+DAY_SUMMARY_QUERY = (
+    f"SELECT {', '.join(column for column, _ in DAY_SUMMARY_COLUMNS)} FROM daily_data WHERE id = ? AND date = ?")
+GOALS_QUERY = "SELECT metric, goal FROM fitness_goals WHERE id = ?"
+WEEKLY_TREND_QUERY = (
+    f"SELECT week, {', '.join(column for column, _ in WEEKLY_TREND_COLUMNS)} FROM weekly_data "
+    "WHERE id = ? AND substr(week, 1, 10) <= ? ORDER BY week DESC LIMIT ?")
+NIGHT_QUERY = (
+    "SELECT timestamp, value FROM minute_sleep "
+    "WHERE id = ? AND date IN (?, ?) AND timestamp >= ? AND timestamp < ? ORDER BY timestamp")
+# Minutes without a reading are stored as 0
+HEART_RATE_QUERY = "SELECT value FROM heartrate_minutes WHERE id = ? AND date = ? AND value > 0"
+
+
+class MetricToolError(Exception):
+    """Raised when a metric tool cannot answer; the message is returned to the agent."""
+
+
+def _user_id(config):
+    user_id = config.get("configurable", {}).get("user_id")
+    if not user_id:
+        raise MetricToolError("No user is associated with this conversation.")
+    if not str(user_id).isdigit():
+        raise MetricToolError(f"Invalid user ID '{user_id}'.")
+    return str(user_id)
+
+
+def _parse_date(value):
+    try:
+        return date_type.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise MetricToolError(f"Invalid date '{value}', use YYYY-MM-DD.")
+
+
+def _round(value):
+    return round(value, 1) if isinstance(value, float) else value
+
+
+def day_summary(connection, user_id, day):
+    """Totals of one day, with the user's goals and how much of each was reached."""
+    row = connection.execute(DAY_SUMMARY_QUERY, (user_id, day.isoformat())).fetchone()
+    if row is None:
+        return {"date": day.isoformat(), "error": "No data for this day."}
+
+    summary = {"date": day.isoformat()}
+    summary.update({name: _round(row[column]) for column, name in DAY_SUMMARY_COLUMNS})
+
+    goals = {}
+    for goal in connection.execute(GOALS_QUERY, (user_id,)):
+        field = GOAL_FIELDS.get(goal["metric"])
+        entry = {"goal": goal["goal"]}
+        if field and summary.get(field[0]) is not None and goal["goal"]:
+            entry["percent_reached"] = round(summary[field[0]] * field[1] / goal["goal"] * 100)
+        goals[goal["metric"]] = entry
+    summary["goals"] = goals
+    return summary
+
+
+def run_metric_query(func, config):
+    """Run `func(connection, user_id)` on a user-scoped connection, turning errors into a message for the agent."""
+    try:
+        user_id = _user_id(config)
+        with scoped_connection(user_id) as connection, query_deadline(connection):
+            return func(connection, user_id)
+    except MetricToolError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        if str(e) == "interrupted":
+            return {"error": f"The lookup took longer than {QUERY_TIMEOUT_SECONDS} seconds."}
+        return {"error": f"Database error: {e}"}
+
+
+@tool
+def get_day_summary(date: str, config: RunnableConfig) -> dict:
+    """
+    Get the user's totals of one day (YYYY-MM-DD): steps, distance, calories, active and
+    sedentary minutes, sleep minutes, heart rate and weight, plus their daily goals and
+    the percentage of each goal reached. Sleep goals are in hours.
+    """
+    return run_metric_query(lambda connection, user_id: day_summary(connection, user_id, _parse_date(date)), config)
+
+
+@tool
+def compare_days(date_a: str, date_b: str, config: RunnableConfig) -> dict:
+    """
+    Compare the user's totals of two days (YYYY-MM-DD). Returns both day summaries and
+    the difference (date_b minus date_a) of every metric.
+    """
+    def compare(connection, user_id):
+        first = day_summary(connection, user_id, _parse_date(date_a))
+        second = day_summary(connection, user_id, _parse_date(date_b))
+        difference = {
+            name: _round(second[name] - first[name])
+            for _, name in DAY_SUMMARY_COLUMNS
+            if isinstance(first.get(name), (int, float)) and isinstance(second.get(name), (int, float))
+        }
+        first.pop("goals", None)
+        second.pop("goals", None)
+        return {"day_a": first, "day_b": second, "difference": difference}
+
+    return run_metric_query(compare, config)
+
+
+@tool
+def weekly_trend(end_date: str, config: RunnableConfig, weeks: int = 4) -> dict:
+    """
+    Get the user's weekly totals for the `weeks` weeks (1-12) up to the week containing
+    end_date (YYYY-MM-DD), oldest first, with the change of every metric compared to the
+    previous week. The most recent week may still be in progress.
+    """
+    def trend(connection, user_id):
+        end = _parse_date(end_date)
+        count = max(1, min(int(weeks), 12))
+        rows = connection.execute(WEEKLY_TREND_QUERY, (user_id, end.isoformat(), count)).fetchall()[::-1]
+
+        result, previous = [], None
+        for row in rows:
+            week = {"week": row["week"]}
+            week.update({name: _round(row[column]) for column, name in WEEKLY_TREND_COLUMNS})
+            if previous is not None:
+                week["change"] = {
+                    name: _round(week[name] - previous[name])
+                    for _, name in WEEKLY_TREND_COLUMNS
+                    if week[name] is not None and previous[name] is not None
+                }
+            result.append(week)
+            previous = week
+        return {"weeks": result} if result else {"error": "No weekly data before this date."}
+
+    return run_metric_query(trend, config)
+
+
+@tool
+def sleep_stages_for_night(night_date: str, config: RunnableConfig) -> dict:
+    """
+    Get the user's sleep of the night starting on night_date (YYYY-MM-DD): minutes asleep,
+    restless and awake, bedtime, wake time and number of awakenings. The night runs from
+    noon on night_date until noon the next day, so "last night" is the day before today.
+    """
+    def night(connection, user_id):
+        start = _parse_date(night_date)
+        end = start + timedelta(days=1)
+        rows = connection.execute(NIGHT_QUERY, (
+            user_id, start.isoformat(), end.isoformat(), f"{start.isoformat()} 12:00:00", f"{end.isoformat()} 12:00:00",
+        )).fetchall()
+        if not rows:
+            return {"night_date": start.isoformat(), "error": "No sleep recorded this night."}
+
+        stages = {stage: 0 for stage in SLEEP_STAGES.values()}
+        awakenings, previous = 0, None
+        for row in rows:
+            stage = SLEEP_STAGES.get(row["value"])
+            if stage:
+                stages[stage] += 1
+            if row["value"] == 3 and previous != 3:
+                awakenings += 1
+            previous = row["value"]
+
+        return {
+            "night_date": start.isoformat(),
+            "bedtime": rows[0]["timestamp"],
+            "wake_time": rows[-1]["timestamp"],
+            "minutes_in_bed": len(rows),
+            **{f"{stage}_minutes": minutes for stage, minutes in stages.items()},
+            "awakenings": awakenings,
+        }
+
+    return run_metric_query(night, config)
+
+
+@tool
+def hr_zones_for_day(date: str, config: RunnableConfig) -> dict:
+    """
+    Get the minutes the user spent in each heart rate zone on a day (YYYY-MM-DD), based on
+    their maximum heart rate (220 - age), plus their minimum, average and maximum heart rate.
+    """
+    def zones(connection, user_id):
+        day = _parse_date(date)
+        try:
+            max_heart_rate = 220 - int(profiles.get(user_id)["age"])
+        except (ProfileError, KeyError, TypeError, ValueError):
+            max_heart_rate = DEFAULT_MAX_HEART_RATE
+
+        values = [row[0] for row in connection.execute(HEART_RATE_QUERY, (user_id, day.isoformat()))]
+        if not values:
+            return {"date": day.isoformat(), "error": "No heart rate data for this day."}
+
+        minutes = {name: 0 for name, _ in HR_ZONES}
+        for value in values:
+            zone = next(name for name, lower in reversed(HR_ZONES) if value >= lower * max_heart_rate)
+            minutes[zone] += 1
+
+        return {
+            "date": day.isoformat(),
+            "max_heart_rate_estimate": max_heart_rate,
+            "zone_lower_bounds_bpm": {name: round(lower * max_heart_rate) for name, lower in HR_ZONES},
+            "minutes_per_zone": minutes,
+            "min_heart_rate": min(values),
+            "avg_heart_rate": round(sum(values) / len(values), 1),
+            "max_heart_rate": max(values),
+            "minutes_measured": len(values),
+        }
+
+    return run_metric_query(zones, config)
+
+
+# Tools offered to the agent before free SQL
+METRIC_TOOLS = [get_day_summary, compare_days, weekly_trend, sleep_stages_for_night, hr_zones_for_day]
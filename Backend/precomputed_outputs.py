@@ -0,0 +1,41 @@
+"""
+precomputed_outputs.py — Storage for generated outputs computed ahead of time
+
+`batch_precompute.py` generates recommendations, suggested questions and metric
+details for every user overnight and stores them in the `precomputed_outputs`
+table of fitness.db. The endpoints read this table before generating anything live.
+
+Each row stores the data fingerprint of the user at the time it was written
+(see `response_cache.data_fingerprint`); a row whose fingerprint no longer
+matches, e.g. after the user changed a goal, is ignored.
+
+All functions take a pooled connection as first argument, so they can be awaited through `database.run_db`.
+"""
+
+import json
+import time
+from response_cache import data_fingerprint
+
+
+def load_output(db, endpoint, user_id, date, variant=""):
+    """
+    Return the precomputed response of `endpoint` for a user and date, or None.
+    `variant` distinguishes outputs of the same endpoint, e.g. "steps:insight" for a detail.
+    """
+    row = db.execute(
+        "SELECT response, fingerprint FROM precomputed_outputs "
+        "WHERE user_id = ? AND date = ? AND endpoint = ? AND variant = ?",
+        (str(user_id), date, endpoint, variant)).fetchone()
+    if row is None or row["fingerprint"] != data_fingerprint(db, user_id, date):
+        return None
+    return json.loads(row["response"])
+
+
+def store_output(db, endpoint, user_id, date, variant, response):
+    """Store a precomputed response, replacing an earlier one for the same user, date and output."""
+    db.execute(
+        "INSERT OR REPLACE INTO precomputed_outputs (user_id, date, endpoint, variant, response, fingerprint, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (str(user_id), date, endpoint, variant, json.dumps(response),
+         data_fingerprint(db, user_id, date), time.time()))
+    db.commit()
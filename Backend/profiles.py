@@ -0,0 +1,97 @@
+"""
+profiles.py — Cached access to user profiles
+
+User profiles (name, age, height, gender) are needed by almost every chatbot
+request but rarely change. This module loads `data/profiles.csv` once into a
+dict keyed by user ID and only reloads it when the file's modification time changes.
+
+Lookups raise typed exceptions instead of returning None, so callers can
+distinguish an unknown user from a missing or unreadable profiles file.
+"""
+
+import csv
+import os
+import threading
+
+# Default location of the profiles file
+PROFILES_FILE = "data/profiles.csv"
+
+# Columns converted from text when the file is loaded
+NUMERIC_COLUMNS = {"height": float, "age": int}
+
+
+class ProfileError(Exception):
+    """Raised when the profiles file cannot be read."""
+
+
+class ProfileNotFoundError(ProfileError, LookupError):
+    """Raised when no profile exists for the requested user ID."""
+
+    def __init__(self, user_id):
+        super().__init__(f"No profile found for user ID {user_id}")
+        self.user_id = user_id
+
+
+class ProfileRepository:
+    """In-memory profile lookup, refreshed when the underlying CSV file changes."""
+
+    def __init__(self, path=PROFILES_FILE):
+        self.path = path
+        self._profiles = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Parse the profiles file into a dict keyed by user ID."""
+        profiles = {}
+        with open(self.path, mode="r", newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                for column, convert in NUMERIC_COLUMNS.items():
+                    if row.get(column):
+                        row[column] = convert(row[column])
+                profiles[row["id"]] = row
+        return profiles
+
+    def _refresh(self):
+        """Reload the profiles if the file was modified since the last load."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            raise ProfileError(f"Profiles file '{self.path}' is not available: {e}") from e
+
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    self._profiles = self._load()
+                except (OSError, ValueError, KeyError, csv.Error) as e:
+                    raise ProfileError(f"Profiles file '{self.path}' could not be read: {e}") from e
+                self._mtime = mtime
+
+    def get(self, user_id):
+        """
+        Return a copy of the profile of `user_id`.
+
+        Raises:
+        -------
+        ProfileNotFoundError
+            If no profile exists for the user.
+        ProfileError
+            If the profiles file is missing or cannot be parsed.
+        """
+        self._refresh()
+        profile = self._profiles.get(str(user_id))
+        if profile is None:
+            raise ProfileNotFoundError(user_id)
+        return dict(profile)
+
+    def all(self):
+        """Return copies of all profiles."""
+        self._refresh()
+        return [dict(profile) for profile in self._profiles.values()]
+
+
+# Shared repository used by the API
+profiles = ProfileRepository()
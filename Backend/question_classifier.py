@@ -0,0 +1,72 @@
+"""
+question_classifier.py — Local fast path for chat question classification
+
+Every chat turn has to decide whether the question needs the user's own data
+(DATA) or can be answered from general knowledge (GENERAL). Most questions make
+this obvious from their wording, so this module scores them against two small
+keyword tables before any LLM call is made:
+
+- DATA cues: the user's metrics ("my steps", "my sleep"), questions about past
+  days ("yesterday", "last week") and explicit references to their data
+- GENERAL cues: requests for tips, examples, exercises or explanations
+
+Only a clear outcome is returned. Mixed or missing cues (follow-ups such as
+"and over the whole week?", other languages) return None, and the caller falls
+back to the LLM classifier.
+"""
+
+import re
+
+# Metrics stored in the fitness tables, as users refer to them
+METRIC_TERMS = (
+    r"steps?|step count|step goal|sleep(?: data| quality)?|slept|heart ?rate|bpm|calories|weight|"
+    r"active minutes|activity|sedentary(?: time| minutes)?|distance|goals?"
+)
+
+# Cues that the answer depends on the user's data, with their weight
+DATA_CUES = [
+    (re.compile(rf"\bmy (?:daily |weekly |recent |current |average )?(?:{METRIC_TERMS})\b", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:today|yesterday|last night|this week|last week|past (?:few )?(?:days|week|month)|previous days)\b", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:my (?:\w+ )?data|based on my|(?:tell|say)(?: me)? about my|how am i doing|am i (?:on track|doing)|did i|did my|compared to|how many|how much did i)\b", re.IGNORECASE), 2),
+    (re.compile(r"\b(?:overview|analy[sz]e|trends?|table)\b", re.IGNORECASE), 1),
+]
+
+# Cues that the question asks for general knowledge, with their weight
+GENERAL_CUES = [
+    (re.compile(r"\b(?:tips?|examples?|ideas|alternatives?|exercises?|excercises?|workouts?|stretches|recipes?|routines?)\b", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:what is|what are|how to|how does|are there|difference between|risks?|benefits?)\b", re.IGNORECASE), 1),
+]
+
+# Minimum score of the winning side, and its minimum lead when both sides have cues
+MIN_SCORE = 2
+MIN_LEAD = 2
+
+
+def _score(cues, text):
+    """Sum the weights of the cues found in `text`."""
+    return sum(weight for pattern, weight in cues if pattern.search(text))
+
+
+def classify_locally(question):
+    """
+    Classify a chat question without an LLM call.
+
+    Parameters:
+    -----------
+    question : str
+        The user's message, without the profile preamble.
+
+    Returns:
+    --------
+    bool or None
+        True if the question needs the user's data, False if it does not, or None
+        when the cues are not conclusive and the LLM should decide.
+    """
+    data_score = _score(DATA_CUES, question)
+    general_score = _score(GENERAL_CUES, question)
+
+    if data_score >= MIN_SCORE and data_score - general_score >= MIN_LEAD:
+        return True
+    if general_score >= 1 and data_score == 0:
+        return False
+    return None
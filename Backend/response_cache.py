@@ -0,0 +1,91 @@
+"""
+response_cache.py — Persistent cache for LLM-generated responses
+
+Recommendations, suggested questions and goal suggestions each run a full agent
+loop, while their result only depends on the request parameters and the user's data.
+This module stores those responses in the `llm_response_cache` table of fitness.db:
+
+- The cache key combines the endpoint, its parameters and a hash of the user's
+  goals and last week of daily data, so changed data never returns a stale answer
+- Entries expire after `CACHE_TTL_SECONDS` and the oldest entries are evicted
+  beyond `CACHE_MAX_ENTRIES`
+- Lookups only read, so cache hits run on a read connection without the write lock
+- Writes to a user's goals or weight call `invalidate_user_responses` in their own transaction
+
+All functions take a pooled connection as first argument, so they can be awaited through `database.run_db`.
+"""
+
+import hashlib
+import json
+import time
+
+# Time-to-live of a cached response
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Maximum number of cached responses
+CACHE_MAX_ENTRIES = 1000
+
+
+def data_fingerprint(db, user_id, date):
+    """Hash the rows an LLM response for `user_id` on `date` is based on."""
+    cursor = db.cursor()
+    cursor.row_factory = None
+    digest = hashlib.sha256()
+
+    cursor.execute("SELECT metric, goal FROM fitness_goals WHERE id = ? ORDER BY metric", (user_id,))
+    digest.update(repr(cursor.fetchall()).encode("utf-8"))
+
+    cursor.execute(
+        "SELECT * FROM daily_data WHERE id = ? AND date BETWEEN date(?, '-6 days') AND ? ORDER BY date",
+        (user_id, date, date))
+    digest.update(repr(cursor.fetchall()).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def lookup_response(db, endpoint, user_id, date, params):
+    """
+    Look up a cached response. Read-only: hits do not update `last_access`, so they never wait on writers.
+
+    Returns:
+    --------
+    tuple
+        `(cache_key, response)`, where `response` is None on a miss. The key is
+        passed to `store_response` once the response has been generated.
+    """
+    key_source = json.dumps({
+        "endpoint": endpoint,
+        "params": params,
+        "data": data_fingerprint(db, user_id, date),
+    }, sort_keys=True)
+    cache_key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    row = db.execute(
+        "SELECT response FROM llm_response_cache WHERE cache_key = ? AND created_at > ?",
+        (cache_key, time.time() - CACHE_TTL_SECONDS)).fetchone()
+    if row is None:
+        return cache_key, None
+    return cache_key, json.loads(row["response"])
+
+
+def store_response(db, cache_key, endpoint, user_id, response):
+    """Store a generated response and evict expired and the oldest entries."""
+    now = time.time()
+    db.execute(
+        "INSERT OR REPLACE INTO llm_response_cache (cache_key, endpoint, user_id, response, created_at, last_access) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (cache_key, endpoint, str(user_id), json.dumps(response), now, now))
+    db.execute("DELETE FROM llm_response_cache WHERE created_at <= ?", (now - CACHE_TTL_SECONDS,))
+    db.execute(
+        "DELETE FROM llm_response_cache WHERE cache_key IN ("
+        "SELECT cache_key FROM llm_response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+        (CACHE_MAX_ENTRIES,))
+    db.commit()
+
+
+def invalidate_user_responses(db, user_id):
+    """
+    Remove all cached responses of a user, e.g. after their goals or weight changed.
+    Does not commit: call it inside the transaction that changes the data.
+    """
+    db.execute("DELETE FROM llm_response_cache WHERE user_id = ?", (str(user_id),))
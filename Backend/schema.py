@@ -0,0 +1,304 @@
+"""
+schema.py — Schema management and migrations for fitness.db
+
+This module builds the SQLite database from the fitness tracker CSVs in `data/`
+and keeps it up to date through a list of numbered migrations:
+
+- Each migration is a function that receives an open connection
+- The number of applied migrations is stored in SQLite's `user_version` pragma
+- `migrate()` only runs the migrations that are still missing, so it is safe to call at every startup
+
+New schema changes should be appended to `MIGRATIONS`; existing entries must never be edited.
+"""
+
+import csv
+import os
+from database import DATABASE_PATH, create_connection
+
+# Directory containing the source CSV files
+DATA_DIR = "data"
+
+# Column definitions of the tables that are loaded from `data/<table>.csv`
+TABLES = {
+    "daily_activity": [
+        ("id", "INTEGER"), ("totalsteps", "INTEGER"), ("totaldistance", "REAL"),
+        ("trackerdistance", "REAL"), ("veryactiveminutes", "INTEGER"),
+        ("fairlyactiveminutes", "INTEGER"), ("lightlyactiveminutes", "INTEGER"),
+        ("sedentaryminutes", "INTEGER"), ("calories", "INTEGER"),
+        ("timestamp", "TEXT"), ("date", "TEXT"),
+    ],
+    "daily_data": [
+        ("id", "INTEGER"), ("totalsteps", "INTEGER"), ("totaldistance", "REAL"),
+        ("trackerdistance", "REAL"), ("veryactiveminutes", "INTEGER"),
+        ("fairlyactiveminutes", "INTEGER"), ("lightlyactiveminutes", "INTEGER"),
+        ("sedentaryminutes", "INTEGER"), ("calories", "INTEGER"),
+        ("timestamp", "TEXT"), ("date", "TEXT"), ("overallactiveminutes", "INTEGER"),
+        ("min_heart_rate", "INTEGER"), ("max_heart_rate", "INTEGER"),
+        ("avg_heart_rate", "REAL"), ("total_sleep_minutes", "INTEGER"),
+        ("weightkg", "REAL"), ("week", "TEXT"), ("week_number", "INTEGER"),
+    ],
+    "weekly_data": [
+        ("id", "INTEGER"), ("week", "TEXT"), ("week_number", "INTEGER"),
+        ("totalsteps", "INTEGER"), ("totaldistance", "REAL"),
+        ("overallactiveminutes", "INTEGER"), ("calories", "INTEGER"),
+        ("total_sleep_minutes", "INTEGER"), ("min_heart_rate", "INTEGER"),
+        ("max_heart_rate", "INTEGER"), ("avg_heart_rate", "REAL"), ("weightkg", "REAL"),
+    ],
+    "weight_log": [
+        ("id", "INTEGER"), ("weightkg", "REAL"), ("bmi", "REAL"),
+        ("timestamp", "TEXT"), ("date", "TEXT"),
+    ],
+    "minute_sleep": [
+        ("id", "INTEGER"), ("date", "TEXT"), ("value", "INTEGER"),
+        ("logid", "INTEGER"), ("timestamp", "TEXT"),
+    ],
+    "hourly_merged": [
+        ("id", "INTEGER"), ("calories", "INTEGER"), ("timestamp", "TEXT"),
+        ("date", "TEXT"), ("totalintensity", "INTEGER"),
+        ("averageintensity", "REAL"), ("steptotal", "INTEGER"),
+    ],
+    "heartrate_minutes": [
+        ("minute", "TEXT"), ("value", "INTEGER"), ("date", "TEXT"), ("id", "INTEGER"),
+    ],
+    "fitness_goals": [
+        ("id", "INTEGER"), ("metric", "TEXT"), ("goal", "INTEGER"),
+    ],
+    "sleep_data": [
+        ("date", "TEXT"), ("awake_minutes", "INTEGER"), ("restless_minutes", "INTEGER"),
+        ("asleep_minutes", "INTEGER"), ("total_minutes_in_bed", "INTEGER"), ("id", "INTEGER"),
+    ],
+}
+
+# Chat storage; these tables are written by the API and imported once from the legacy CSV files
+CONVERSATION_TABLES = {
+    "conversation_messages": [
+        ("message_id", "INTEGER PRIMARY KEY"), ("conversation_id", "TEXT NOT NULL"),
+        ("user_id", "TEXT NOT NULL"), ("role", "TEXT NOT NULL"),
+        ("message", "TEXT"), ("timestamp", "TEXT"),
+    ],
+    "conversation_subjects": [
+        ("conversation_id", "TEXT NOT NULL"), ("user_id", "TEXT NOT NULL"),
+        ("subject", "TEXT"), ("timestamp", "TEXT"),
+    ],
+}
+
+# Lookup indexes: every route filters on the user id, most of them also on the date
+INDEXES = [
+    ("idx_daily_activity_id_date", "daily_activity", "id, date"),
+    ("idx_daily_data_id_date", "daily_data", "id, date"),
+    ("idx_weekly_data_id_week", "weekly_data", "id, week"),
+    ("idx_weight_log_id_date", "weight_log", "id, date"),
+    ("idx_minute_sleep_id_date", "minute_sleep", "id, date"),
+    ("idx_hourly_merged_id_date", "hourly_merged", "id, date"),
+    ("idx_heartrate_minutes_id_date", "heartrate_minutes", "id, date"),
+    ("idx_heartrate_minutes_id_minute", "heartrate_minutes", "id, minute"),
+    ("idx_fitness_goals_id_metric", "fitness_goals", "id, metric"),
+    ("idx_sleep_data_id_date", "sleep_data", "id, date"),
+]
+
+
+def load_csv(connection, table_name):
+    """Insert all rows of `data/<table_name>.csv` into the given table."""
+    csv_path = os.path.join(DATA_DIR, f"{table_name}.csv")
+    if not os.path.isfile(csv_path):
+        return 0
+
+    with open(csv_path, mode="r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        columns = ", ".join(header)
+        placeholders = ", ".join(["?"] * len(header))
+        # Empty CSV fields are stored as NULL; column affinity converts the other values
+        rows = ([value if value != "" else None for value in row] for row in reader)
+        cursor = connection.executemany(
+            f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", rows)
+    return cursor.rowcount
+
+
+def create_tables_from_csv(connection):
+    """Migration 1: create the fitness tables and fill empty ones from the CSV files."""
+    for table_name, columns in TABLES.items():
+        column_definitions = ", ".join(f"{name} {column_type}" for name, column_type in columns)
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({column_definitions})")
+
+        if connection.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is None:
+            load_csv(connection, table_name)
+
+
+def create_lookup_indexes(connection):
+    """Migration 2: add composite indexes for the per-user and per-date lookups."""
+    for index_name, table_name, columns in INDEXES:
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+    connection.execute("ANALYZE")
+
+
+def create_heartrate_day_index(connection):
+    """
+    Migration 3: cover per-day heart rate lookups with a single (id, date, minute, value) index.
+
+    The index returns a day's values in minute order without touching the table,
+    and replaces the narrower (id, date) index, which is a prefix of it.
+    """
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_heartrate_minutes_id_date_minute "
+        "ON heartrate_minutes (id, date, minute, value)")
+    connection.execute("DROP INDEX IF EXISTS idx_heartrate_minutes_id_date")
+    connection.execute("ANALYZE heartrate_minutes")
+
+
+def read_subject_rows(csv_path):
+    """
+    Read the rows of the legacy conversation subjects CSV.
+
+    Older rows were written as one quoted field containing the whole record,
+    so those rows are parsed a second time. Surrounding quotes of the titles are removed.
+    """
+    with open(csv_path, mode="r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            if len(row) == 1:
+                row = next(csv.reader([row[0]]))
+            if len(row) != 4:
+                continue
+            conversation_id, user_id, subject, timestamp = row
+            yield conversation_id, user_id, subject.strip('"'), timestamp
+
+
+def create_conversation_tables(connection):
+    """Migration 4: store conversations in indexed tables and import the legacy CSV files once."""
+    for table_name, columns in CONVERSATION_TABLES.items():
+        column_definitions = ", ".join(f"{name} {column_type}" for name, column_type in columns)
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({column_definitions})")
+
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation "
+        "ON conversation_messages (conversation_id, message_id)")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversation_subjects_user_timestamp "
+        "ON conversation_subjects (user_id, timestamp)")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversation_subjects_conversation "
+        "ON conversation_subjects (conversation_id)")
+
+    messages_path = os.path.join(DATA_DIR, "conversation_messages.csv")
+    if os.path.isfile(messages_path):
+        with open(messages_path, mode="r", newline="", encoding="utf-8") as file:
+            rows = ((row["conversation_id"], row["user_id"], row["role"], row["message"] or None, row["timestamp"])
+                    for row in csv.DictReader(file))
+            connection.executemany(
+                "INSERT INTO conversation_messages (conversation_id, user_id, role, message, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+
+    subjects_path = os.path.join(DATA_DIR, "conversation_subjects.csv")
+    if os.path.isfile(subjects_path):
+        connection.executemany(
+            "INSERT INTO conversation_subjects (conversation_id, user_id, subject, timestamp) "
+            "VALUES (?, ?, ?, ?)", read_subject_rows(subjects_path))
+
+
+def create_response_cache_table(connection):
+    """Migration 5: add the table backing the LLM response cache (see `response_cache.py`)."""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            cache_key TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_user ON llm_response_cache (user_id)")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_access ON llm_response_cache (last_access)")
+
+
+def create_answer_cache_table(connection):
+    """Migration 6: add the table backing the chat answer cache (see `answer_cache.py`)."""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS chat_answer_cache (
+            user_id TEXT NOT NULL,
+            data_date TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            UNIQUE (user_id, data_date, fingerprint, question)
+        )
+    """)
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_answer_cache_user_last_access ON chat_answer_cache (user_id, last_access)")
+
+
+def create_precomputed_outputs_table(connection):
+    """Migration 7: add the table holding the nightly precomputed outputs (see `precomputed_outputs.py`)."""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS precomputed_outputs (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            variant TEXT NOT NULL DEFAULT '',
+            response TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (user_id, date, endpoint, variant)
+        )
+    """)
+
+
+def create_conversation_summaries_table(connection):
+    """Migration 8: store the rolling summary of each conversation, so it survives restarts and is shared by workers."""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            conversation_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            covered_messages INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+
+
+# Ordered list of migrations; the position in the list is the schema version
+MIGRATIONS = [
+    create_tables_from_csv,
+    create_lookup_indexes,
+    create_heartrate_day_index,
+    create_conversation_tables,
+    create_response_cache_table,
+    create_answer_cache_table,
+    create_precomputed_outputs_table,
+    create_conversation_summaries_table,
+]
+
+
+def migrate(database_path=DATABASE_PATH):
+    """
+    Bring the database at `database_path` up to the latest schema version.
+
+    Each pending migration runs in its own transaction together with the version bump,
+    so an interrupted startup resumes at the first migration that did not complete.
+
+    Returns:
+    --------
+    int
+        The schema version after migrating.
+    """
+    connection = create_connection(database_path)
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            connection.execute("BEGIN")
+            try:
+                migration(connection)
+                connection.execute(f"PRAGMA user_version = {number}")
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            version = number
+        return version
+    finally:
+        connection.close()
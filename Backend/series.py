@@ -0,0 +1,95 @@
+"""
+series.py — Compact binary encoding for minute-level series
+
+Minute-level datasets (heart rate, minute sleep) can be requested in a columnar
+binary format instead of JSON by sending `Accept: application/x-fitness-series`.
+
+The payload is a little-endian header followed by packed int16 values:
+
+    magic  (4 bytes)  b"FCS1"
+    start  (int64)    Unix timestamp (seconds) of the first value
+    step   (int32)    Seconds between two consecutive values
+    count  (uint32)   Number of values
+    values (int16[])  One value per step; slots without a reading hold -1
+
+The datasets store 0 (or NULL) for a minute without a reading, so those are
+packed as missing too. Readings must fit in 1..32767.
+
+The values are read straight from the SQLite cursor as tuples, without building
+a dict per row.
+"""
+
+import struct
+import sys
+from array import array
+
+# Media type used for content negotiation
+MEDIA_TYPE = "application/x-fitness-series"
+
+# Header layout and marker
+HEADER = struct.Struct("<4sqiI")
+MAGIC = b"FCS1"
+
+# Value stored in slots without a reading
+MISSING = -1
+
+# Largest value an int16 slot can hold
+MAX_VALUE = 2 ** 15 - 1
+
+
+def accepts_series(request):
+    """Return True if the client asked for the binary series format."""
+    return MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def pack_series(rows, start=None, step=60):
+    """
+    Pack `(unix_timestamp, value)` rows, ordered by time, into the binary series format.
+
+    Parameters:
+    -----------
+    rows : iterable of tuple
+        Rows as returned by the cursor: the timestamp in seconds and an integer value,
+        0 or None when there was no reading.
+    start : int, optional
+        Timestamp of the first slot. Defaults to the timestamp of the first row.
+    step : int
+        Seconds covered by one slot.
+
+    Returns:
+    --------
+    bytes
+        The encoded series.
+
+    Raises:
+    -------
+    ValueError
+        If a reading is negative or does not fit in an int16.
+    """
+    values = array("h")
+    for timestamp, value in rows:
+        if start is None:
+            start = timestamp - timestamp % step
+        slot = (timestamp - start) // step
+        if slot < 0:
+            continue
+        if not value:
+            value = MISSING
+        elif not 0 < value <= MAX_VALUE:
+            raise ValueError(f"Value {value} at {timestamp} is outside the series range 1..{MAX_VALUE}.")
+        if slot >= len(values):
+            values.extend(array("h", [MISSING]) * (slot - len(values) + 1))
+        values[slot] = value
+
+    if sys.byteorder != "little":
+        values.byteswap()
+    header = HEADER.pack(MAGIC, start or 0, step, len(values))
+    return header + values.tobytes()
+
+
+def read_series(db, query, params, start=None, step=60):
+    """Run a query returning `(unix_timestamp, value)` rows and pack the result."""
+    cursor = db.cursor()
+    cursor.row_factory = None  # Plain tuples, no per-row Row objects or dicts
+    cursor.execute(query, params)
+    return pack_series(cursor, start=start, step=step)
@@ -0,0 +1,46 @@
+"""
+single_flight.py — Coalescing of identical in-flight generations
+
+The app often requests the same generated output several times in quick
+succession (tab switches, remounts). `SingleFlight` makes concurrent calls with
+the same key share one running coroutine: the first caller starts it, later
+callers await the same result. Once it finishes, the next call starts a new run.
+
+Counters of started and coalesced calls are kept for monitoring.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """Runs at most one coroutine per key at a time and shares its result with every caller."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, generate):
+        """
+        Return the result of `generate()`, or of the run already in flight for `key`.
+
+        The shared run is shielded, so a caller that disconnects does not cancel it for the others.
+        Exceptions are raised to every caller.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(generate())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self):
+        """Return the counters and the number of runs currently in flight."""
+        return {"started": self.started, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -0,0 +1,223 @@
+"""
+sql_tool.py — Guarded SQL query tool for the chatbot agent
+
+The agent answers data questions by writing SQL. This module provides the
+`sql_db_query` tool it uses, which validates and limits every query before
+anything reaches the LLM context:
+
+- Queries run on a separate pool of read-only connections. On each of them, every
+  fitness table is shadowed by a TEMP VIEW of the same name that only contains the
+  rows of the connection's current user (`scoped_connection`), so no query can see
+  another user's data, whatever its WHERE clause, UNIONs or JOINs
+- The user ID is taken from the run's config, never from the LLM
+- An SQLite authorizer only allows SELECTs that read the fitness tables through these views
+- `EXPLAIN QUERY PLAN` is checked first: full scans of large tables are rejected
+- A progress handler aborts statements that run longer than `QUERY_TIMEOUT_SECONDS`
+- At most `MAX_RESULT_ROWS` rows and `MAX_RESULT_BYTES` characters are returned
+
+Rejected queries return an explanation instead of raising, so the agent can fix
+its query. The duration of every query is logged.
+"""
+
+import logging
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+from database import ConnectionPool
+from data_endpoints import VALID_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Read-only connections used by the agent, separate from the API's pool
+READ_ONLY_POOL_SIZE = 4
+read_only_pool = ConnectionPool(size=READ_ONLY_POOL_SIZE, read_only=True)
+
+# Limits applied to every query
+QUERY_TIMEOUT_SECONDS = 2
+MAX_RESULT_ROWS = 200
+MAX_RESULT_BYTES = 8000
+
+# Tables with more rows than this may not be scanned in full
+FULL_SCAN_ROW_LIMIT = 1000
+
+# SQLite virtual machine instructions between two timeout checks
+PROGRESS_HANDLER_STEPS = 10000
+
+# Operations the authorizer allows; anything else (writes, pragmas, attach, ...) is denied
+ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# SQL function returning the user a connection is scoped to; the user-scoped views filter on it
+SCOPED_USER_FUNCTION = "scoped_user_id"
+
+# Table names following FROM or JOIN, with an optional alias
+TABLE_REFERENCE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+
+# Plan steps reading a whole table, e.g. "SCAN main.heartrate_minutes"
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (?:\w+\.)?(\w+)")
+
+# Keywords that may appear in the SQL clause following a table name instead of an alias
+NON_ALIAS_KEYWORDS = {
+    "where", "join", "inner", "left", "right", "cross", "natural", "on", "using", "group", "order",
+    "limit", "union", "except", "intersect", "having", "window",
+}
+
+_table_sizes = {}
+
+# Scope of every prepared read-only connection: id(connection) -> (connection, {"user_id": ...})
+_scopes = {}
+
+
+class QueryRejected(Exception):
+    """Raised when a query does not pass validation."""
+
+
+def _authorize(action, table, column, database, view):
+    """
+    SQLite authorizer: allow reading the fitness tables only through their user-scoped view.
+    Reads of a view come from the `temp` database, and the reads it makes report its name as `view`;
+    direct reads such as `main.daily_data` report neither. Reads of CTEs and subqueries (e.g. by
+    `COUNT(*)`) have no database; their own reads are checked separately.
+    """
+    if action not in ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_READ and database is not None and (
+            table not in VALID_TABLES or (database != "temp" and view != table)):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def table_sizes(connection):
+    """Row counts of the fitness tables, counted once per process."""
+    if not _table_sizes:
+        for table in VALID_TABLES:
+            _table_sizes[table] = connection.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+    return _table_sizes
+
+
+def _prepare(connection):
+    """Create the user-scoped views on a read-only connection once, and return its scope."""
+    entry = _scopes.get(id(connection))
+    if entry is not None and entry[0] is connection:
+        return entry[1]
+
+    scope = {"user_id": None}
+    connection.create_function(SCOPED_USER_FUNCTION, 0, lambda: scope["user_id"], deterministic=True)
+    for table in VALID_TABLES:
+        connection.execute(
+            f"CREATE TEMP VIEW IF NOT EXISTS {table} AS "
+            f"SELECT * FROM main.{table} WHERE id = {SCOPED_USER_FUNCTION}()")
+    table_sizes(connection)
+    # The entry keeps the connection alive, so its id is never reused by another connection
+    _scopes[id(connection)] = (connection, scope)
+    return scope
+
+
+@contextmanager
+def scoped_connection(user_id):
+    """
+    Borrow a read-only connection on which the fitness tables only contain the rows of `user_id`,
+    and on which only SELECTs reading those tables are authorized.
+    """
+    with read_only_pool.connection() as connection:
+        scope = _prepare(connection)
+        scope["user_id"] = int(user_id)
+        connection.set_authorizer(_authorize)
+        try:
+            yield connection
+        finally:
+            connection.set_authorizer(None)
+            scope["user_id"] = None
+
+
+@contextmanager
+def query_deadline(connection):
+    """Abort statements on `connection` that run longer than `QUERY_TIMEOUT_SECONDS` ("interrupted" error)."""
+    deadline = time.monotonic() + QUERY_TIMEOUT_SECONDS
+    connection.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_HANDLER_STEPS)
+    try:
+        yield connection
+    finally:
+        connection.set_progress_handler(None, 0)
+
+
+def check_query_plan(connection, query):
+    """Reject queries whose plan scans a large table in full."""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE_PATTERN.findall(query):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in NON_ALIAS_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+
+    sizes = table_sizes(connection)
+    for step in connection.execute(f"EXPLAIN QUERY PLAN {query}"):
+        match = FULL_SCAN_PATTERN.match(step["detail"])
+        if match is None:
+            continue
+        table = aliases.get(match.group(1).lower())
+        if sizes.get(table, 0) > FULL_SCAN_ROW_LIMIT:
+            raise QueryRejected(
+                f"The query reads all {sizes[table]} rows of {table}. Filter on date "
+                "(or another indexed column) and select only the columns you need.")
+
+
+def run_query(query, user_id):
+    """
+    Validate and run one agent query for `user_id`.
+
+    Returns:
+    --------
+    str
+        The result rows as a list of tuples (truncated to the result limits), or an error message.
+    """
+    query = query.strip().rstrip(";")
+    start = time.perf_counter()
+    rows = []
+    try:
+        with scoped_connection(user_id) as connection:
+            check_query_plan(connection, query)
+
+            with query_deadline(connection):
+                cursor = connection.cursor()
+                cursor.row_factory = None
+                cursor.execute(query)
+                rows = cursor.fetchmany(MAX_RESULT_ROWS + 1)
+    except QueryRejected as e:
+        result = f"Error: query rejected. {e}"
+    except sqlite3.DatabaseError as e:
+        if str(e) == "interrupted":
+            result = f"Error: the query took longer than {QUERY_TIMEOUT_SECONDS} seconds. Narrow it down."
+        elif str(e) == "not authorized":
+            result = "Error: query rejected. Only SELECT queries on the fitness tables are allowed."
+        else:
+            result = f"Error: {e}"
+    except sqlite3.Error as e:
+        result = f"Error: {e}"
+    else:
+        result = str(rows[:MAX_RESULT_ROWS])
+        if len(rows) > MAX_RESULT_ROWS:
+            result += f"\n(Only the first {MAX_RESULT_ROWS} rows are shown; aggregate or narrow the query.)"
+        if len(result) > MAX_RESULT_BYTES:
+            result = result[:MAX_RESULT_BYTES] + "\n(Result truncated; select fewer columns or rows.)"
+
+    logger.info("sql_db_query for user %s: %.1f ms, %d rows: %s", user_id, (time.perf_counter() - start) * 1000,
+                min(len(rows), MAX_RESULT_ROWS), " ".join(query.split()))
+    return result
+
+
+@tool("sql_db_query")
+def sql_db_query(query: str, config: RunnableConfig) -> str:
+    """
+    Execute a read-only SQL SELECT query against the user's fitness data and get back the result.
+    The tables only contain the current user's rows. Select only the columns and rows that
+    are needed, filtering on date where possible. If the query is rejected or returns an
+    error, rewrite it and try again.
+    """
+    user_id = config.get("configurable", {}).get("user_id")
+    if not user_id:
+        return "Error: no user is associated with this conversation."
+    if not str(user_id).isdigit():
+        return f"Error: invalid user ID '{user_id}'."
+    return run_query(query, user_id)
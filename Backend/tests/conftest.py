@@ -0,0 +1,8 @@
+"""
+Shared pytest setup: every test session runs on a scratch copy of the database
+with the LLM stub (see environment.py), prepared before backend modules are imported.
+"""
+
+from environment import prepare_environment
+
+prepare_environment()
@@ -0,0 +1,50 @@
+"""
+environment.py — Scratch environment for tests and benchmarks
+
+The backend resolves `data/...` relative to the working directory and selects its
+LLM backend at import time. `prepare_environment` therefore has to run before any
+backend module is imported: it copies the CSVs from `Backend/data` into a temporary
+directory, switches to it, selects the local LLM stub and builds fitness.db there
+with `schema.migrate`, so the real database is never touched. The directory is
+removed when the process exits.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "data")
+
+# The only user in the sample data
+USER_ID = "6962181067"
+
+
+def prepare_environment(llm_provider="stub", llm_latency_ms=0):
+    """
+    Build a migrated copy of the database in a temporary directory and make it the working directory.
+
+    Returns:
+    --------
+    str
+        The path of the temporary directory.
+    """
+    workdir = tempfile.mkdtemp(prefix="fitness-")
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    os.makedirs(os.path.join(workdir, "data"))
+    for name in os.listdir(DATA_DIR):
+        if name.endswith(".csv"):
+            shutil.copy(os.path.join(DATA_DIR, name), os.path.join(workdir, "data", name))
+
+    os.environ["LLM_PROVIDER"] = llm_provider
+    os.environ["LLM_STUB_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ.setdefault("OPENAI_API_KEY", "local")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+
+    from schema import migrate
+    migrate()
+    return workdir
@@ -0,0 +1,46 @@
+"""Tests for the similarity cache of chat answers."""
+
+import pytest
+from answer_cache import invalidate_user_answers, lookup_answer, store_answer
+from database import pool
+from environment import USER_ID
+
+DATE = "2016-04-14"
+
+# Questions that must share an answer
+SAME_QUESTIONS = [
+    ("Give me an overview of my activity today", "Can you give me an overview of my activity today?"),
+    ("How did I sleep last night?", "How did I sleep last night"),
+    ("What is my max heart rate today?", "What's my maximum heart rate today?"),
+    ("How many steps did I take today?", "How many steps did i take today"),
+]
+
+# Similar questions that ask for something else and must never share an answer
+DIFFERENT_QUESTIONS = [
+    ("Did I reach my step goal today?", "Did I reach my sleep goal today?"),
+    ("How active was I today?", "How inactive was I today?"),
+    ("What was my max heart rate today?", "What was my min heart rate today?"),
+    ("Did I sleep better than average last night?", "Did I sleep worse than average last night?"),
+    ("How many calories did I burn today?", "How many calories did I burn yesterday?"),
+    ("Did I walk 5 km today?", "Did I walk 8 km today?"),
+    ("Did I reach my step goal today?", "Didn't I reach my step goal today?"),
+]
+
+
+def cached_answer(question, stored_question):
+    """Store an answer for `stored_question` and look up `question` in a fresh cache."""
+    with pool.connection(write=True) as connection:
+        invalidate_user_answers(connection, USER_ID)
+        fingerprint, _ = lookup_answer(connection, USER_ID, DATE, stored_question)
+        store_answer(connection, USER_ID, DATE, fingerprint, stored_question, "cached answer")
+        return lookup_answer(connection, USER_ID, DATE, question)[1]
+
+
+@pytest.mark.parametrize("question, stored_question", SAME_QUESTIONS)
+def test_rephrased_question_hits(question, stored_question):
+    assert cached_answer(question, stored_question) == "cached answer"
+
+
+@pytest.mark.parametrize("question, stored_question", DIFFERENT_QUESTIONS + [pair[::-1] for pair in DIFFERENT_QUESTIONS])
+def test_different_question_misses(question, stored_question):
+    assert cached_answer(question, stored_question) is None
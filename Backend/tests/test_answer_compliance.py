@@ -0,0 +1,61 @@
+"""Tests for the local checks deciding whether the judge LLM reviews an answer."""
+
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage
+import chatbot_endpoints_sql as chatbot
+
+COMPLIANT = [
+    ("How many steps did I walk today?", "You walked 10,199 steps today, 85% of your 12,000 step goal."),
+    ("How did I sleep last night?", "You slept 6h 55m last night, close to your 7 hour goal."),
+    ("Give me some stretching tips", "- Hold each stretch for 30 seconds\n- Breathe slowly\n- Stretch after workouts"),
+    ("Give me 5 tips to sleep better", "1. Keep a schedule\n2. Avoid screens\n3. Keep it cool\n4. Skip late coffee\n5. Wind down"),
+    ("Was my heart rate high?", "Your average heart rate was 78 bpm, within a normal resting range."),
+]
+
+NON_COMPLIANT = [
+    # More than 3 list items without being asked for a number
+    ("Give me some tips to sleep better", "- Keep a schedule\n- Avoid screens\n- Keep it cool\n- Skip late coffee"),
+    # Storage details
+    ("How many steps did I walk today?", "I ran a SQL query on the daily_data table: 10,199 steps."),
+    ("How many steps did I walk today?", "User 6962181067 walked 10,199 steps today."),
+    # Sleep in minutes
+    ("How did I sleep last night?", "You slept 415 minutes last night."),
+    # Medical advice
+    ("My heart rate was high, what should I do?", "Take 200 mg of ibuprofen before your run."),
+    ("Why can't I sleep?", "This looks like insomnia; ask for a prescription of sleeping pills."),
+    ("My resting heart rate is 95", "Based on these readings I would diagnose tachycardia."),
+]
+
+
+@pytest.mark.parametrize("question, answer", COMPLIANT)
+def test_compliant_answers_pass(question, answer):
+    assert chatbot.answer_is_compliant(question, answer)
+
+
+@pytest.mark.parametrize("question, answer", NON_COMPLIANT)
+def test_non_compliant_answers_fail(question, answer):
+    assert not chatbot.answer_is_compliant(question, answer)
+
+
+class RecordingJudge:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content="Corrected answer.")
+
+
+@pytest.mark.parametrize("question, answer, judged", [
+    *((question, answer, False) for question, answer in COMPLIANT),
+    *((question, answer, True) for question, answer in NON_COMPLIANT),
+])
+def test_judge_runs_only_for_non_compliant_answers(monkeypatch, question, answer, judged):
+    judge = RecordingJudge()
+    monkeypatch.setattr(chatbot, "judge_llm", judge)
+
+    state = asyncio.run(chatbot.format_output_response({"message": question, "answer": answer}))
+
+    assert judge.calls == int(judged)
+    assert state["answer"] == ("Corrected answer." if judged else answer)
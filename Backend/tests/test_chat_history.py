@@ -0,0 +1,69 @@
+"""Tests for the conversation history cache and the persisted rolling summaries."""
+
+from langchain_core.messages import SystemMessage
+import chatbot_endpoints_sql as chatbot
+from chat_history import ConversationHistoryCache
+from database import pool
+from environment import USER_ID
+from llm_provider import STUB_REPLY
+
+
+def insert_message_directly(conversation_id, role, message):
+    """Store a message the way another worker would, bypassing this process's cache."""
+    with pool.connection(write=True) as connection:
+        connection.execute(
+            "INSERT INTO conversation_messages (conversation_id, user_id, role, message, timestamp) "
+            "VALUES (?, ?, ?, ?, '2016-04-14T10:00:00')", (conversation_id, USER_ID, role, message))
+        connection.commit()
+
+
+def test_cached_history_picks_up_messages_from_other_workers():
+    conversation_id = "history_test_workers"
+    chatbot.save_message(conversation_id, USER_ID, "user", "How did I sleep?")
+    assert chatbot.history_cache.get(conversation_id, chatbot.load_conversation_messages) == [("user", "How did I sleep?")]
+
+    insert_message_directly(conversation_id, "assistant", "You slept 7 hours.")
+    chatbot.save_message(conversation_id, USER_ID, "user", "And the night before?")
+
+    assert chatbot.history_cache.get(conversation_id, chatbot.load_conversation_messages) == [
+        ("user", "How did I sleep?"), ("assistant", "You slept 7 hours."), ("user", "And the night before?")]
+
+
+def test_summary_survives_eviction():
+    conversation_id = "history_test_summary"
+    for number in range(chatbot.HISTORY_WINDOW_MESSAGES + chatbot.SUMMARY_BATCH_MESSAGES):
+        chatbot.save_message(conversation_id, USER_ID, "user" if number % 2 == 0 else "assistant", f"Message {number}")
+    chatbot.update_history_summary(conversation_id)
+
+    chatbot.history_cache.invalidate()
+    history = chatbot.get_chat_history(conversation_id)
+
+    assert isinstance(history[0], SystemMessage) and STUB_REPLY in history[0].content
+    assert len(history) == chatbot.HISTORY_WINDOW_MESSAGES + 1
+    assert chatbot.load_history_summary(conversation_id) == (STUB_REPLY, chatbot.SUMMARY_BATCH_MESSAGES)
+
+
+def test_older_summary_does_not_replace_newer_one():
+    conversation_id = "history_test_summary_race"
+    chatbot.store_history_summary(conversation_id, "Covers eight messages", 8)
+    chatbot.store_history_summary(conversation_id, "Covers four messages", 4)
+    assert chatbot.load_history_summary(conversation_id) == ("Covers eight messages", 8)
+
+
+def test_cache_loads_only_new_rows_and_never_duplicates():
+    rows = [(1, "user", "a"), (2, "assistant", "b")]
+    requests = []
+
+    def load(conversation_id, after_message_id):
+        requests.append(after_message_id)
+        return [row for row in rows if row[0] > after_message_id]
+
+    cache = ConversationHistoryCache(max_conversations=1)
+    assert cache.get("c", load) == [("user", "a"), ("assistant", "b")]
+    rows.append((3, "user", "c"))
+    assert cache.get("c", load) == [("user", "a"), ("assistant", "b"), ("user", "c")]
+    assert requests == [0, 2]
+
+    cache.get("other", load)  # Evicts "c"
+    assert cache.get("c", load) == [("user", "a"), ("assistant", "b"), ("user", "c")]
+    assert requests[-1] == 0
@@ -0,0 +1,97 @@
+"""Tests for the streaming chat endpoint, run against the LLM stub."""
+
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.tools import tool
+from langgraph.prebuilt import create_react_agent
+import chatbot_endpoints_sql as chatbot
+from environment import USER_ID
+from llm_provider import STUB_REPLY
+
+app = FastAPI()
+app.include_router(chatbot.router, prefix="/chat")
+client = TestClient(app)
+
+# Classified locally as a data question, so the agent answers it
+DATA_QUESTION = "How many steps did I walk today?"
+
+
+def stream_events(message, conversation_id):
+    """Post a chat to the streaming endpoint and return its `(event, data)` pairs."""
+    response = client.post("/chat/chat/stream", json={
+        "user_id": USER_ID, "message": message, "conversation_id": conversation_id})
+    assert response.status_code == 200
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def streamed_text(events):
+    return "".join(data["content"] for event, data in events if event == "token")
+
+
+def test_stream_sends_only_the_final_answer():
+    events = stream_events(DATA_QUESTION, "stream_test_agent")
+
+    # The stub makes the agent call a tool before answering
+    assert any(event == "progress" and data["message"] in chatbot.STREAM_TOOL_MESSAGES.values() for event, data in events)
+    assert streamed_text(events) == STUB_REPLY
+    assert events[-1] == ("answer", {"response": STUB_REPLY, "conversation_id": "stream_test_agent"})
+
+
+def test_stream_sends_direct_answers():
+    events = stream_events("Can you give me some tips for a stretching routine?", "stream_test_general")
+
+    assert streamed_text(events) == STUB_REPLY
+    assert events[-1][0] == "answer"
+
+
+def test_stream_skips_model_calls_inside_tools(monkeypatch):
+    @tool
+    async def check_query() -> str:
+        """Check a query with the LLM, like the SQL toolkit's query checker."""
+        return (await chatbot.llm.ainvoke("SELECT totalsteps FROM daily_data")).content + " (checked)"
+
+    monkeypatch.setattr(chatbot, "agent_executor", create_react_agent(
+        chatbot.llm.bind_tools([check_query]).with_config(tags=[chatbot.ANSWER_TAG]), [check_query], prompt="Answer."))
+    events = stream_events(DATA_QUESTION, "stream_test_nested")
+
+    assert streamed_text(events) == STUB_REPLY
+    assert events[-1][0] == "answer"
+
+
+@pytest.mark.parametrize("tags, node, parents, tool_calls, expected", [
+    (["chat_answer"], "agent", [], [], True),
+    (["chat_answer"], "llm_answer", [], [], True),
+    ([], "agent", [], [], False),
+    (["chat_answer"], "tools", [], [], False),
+    (["chat_answer"], "agent", ["tool-run"], [], False),
+    (["chat_answer"], "agent", [], [{"name": "sql_db_query", "args": "{}", "index": 0}], False),
+])
+def test_is_answer_chunk(tags, node, parents, tool_calls, expected):
+    class Chunk:
+        tool_call_chunks = tool_calls
+
+    event = {"tags": tags, "metadata": {"langgraph_node": node}, "parent_ids": parents, "data": {"chunk": Chunk()}}
+    assert chatbot.is_answer_chunk(event, {"tool-run"}) is expected
+
+
+class FailingGraph:
+    async def astream_events(self, state, version):
+        raise RuntimeError("graph failed")
+        yield
+
+
+def test_stream_sends_an_error_event_and_logs_the_failure(monkeypatch, caplog):
+    monkeypatch.setattr(chatbot, "chat_graph", FailingGraph())
+
+    with caplog.at_level("ERROR", logger=chatbot.logger.name):
+        events = stream_events("How many steps did I walk on the ninth of May?", "stream_test_error")
+
+    assert [event for event, _ in events] == ["error"]
+    assert events[0][1]["conversation_id"] == "stream_test_error"
+    assert "graph failed" in caplog.text
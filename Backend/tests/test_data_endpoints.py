@@ -0,0 +1,160 @@
+"""Tests for the data routes."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_endpoints import _fetch_batch, router
+from database import DATABASE_PATH, create_connection
+from environment import USER_ID
+
+app = FastAPI()
+app.include_router(router, prefix="/data")
+client = TestClient(app)
+
+
+def count_rows(table, start, end):
+    connection = create_connection(DATABASE_PATH)
+    try:
+        return connection.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE id = ? AND date BETWEEN ? AND ?", (USER_ID, start, end)).fetchone()[0]
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("table, order_column", [("heartrate_minutes", "minute"), ("minute_sleep", "timestamp")])
+def test_range_pages_cover_every_row_once(table, order_column):
+    start, end = "2016-04-11", "2016-04-12"
+    rows, cursor = [], None
+    while True:
+        params = {"user_id": USER_ID, "start": start, "end": end, "limit": 700}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get(f"/data/{table}/range", params=params).json()
+        rows += page["data"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(rows) == count_rows(table, start, end) > 700
+    keys = [(row["date"], row[order_column]) for row in rows]
+    assert len(set(keys)) == len(keys)
+    assert [row["date"] for row in rows] == sorted(row["date"] for row in rows)
+
+
+def test_range_heart_rate_page_is_read_in_index_order():
+    connection = create_connection(DATABASE_PATH)
+    try:
+        plan = [row["detail"] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT minute AS row_key, * FROM heartrate_minutes "
+            "WHERE id = ? AND date BETWEEN ? AND ? AND (date > ? OR (date = ? AND minute > ?)) "
+            "ORDER BY date, minute LIMIT ?",
+            (USER_ID, "2016-04-01", "2016-04-12", "2016-04-05", "2016-04-05", "2016-04-05 10:00:00", 500))]
+    finally:
+        connection.close()
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_range_rejects_invalid_cursor():
+    response = client.get("/data/daily_data/range", params={
+        "user_id": USER_ID, "start": "2016-04-01", "end": "2016-04-12", "cursor": "2016-04-05|abc"})
+    assert response.status_code == 400
+
+
+def test_downsampled_heart_rate_ignores_minutes_without_a_reading():
+    date = "2016-05-08"
+    values = client.get("/data/heartrate/minute", params={"user_id": USER_ID, "bydate": date, "resolution": "hourly"}).json()["heart_rate_values"]
+
+    connection = create_connection(DATABASE_PATH)
+    try:
+        expected = connection.execute(
+            "SELECT ROUND(AVG(value)) FROM heartrate_minutes WHERE id = ? AND date = ? AND minute LIKE '% 18:%' AND value > 0",
+            (USER_ID, date)).fetchone()[0]
+    finally:
+        connection.close()
+
+    assert len(values) == 24
+    assert values[18] == expected == 67
+    assert values[19] is None and values[20] is None
+    assert values[21] == 91
+
+
+def post_batch(queries):
+    return client.post("/data/batch", json={"queries": queries})
+
+
+def test_batch_matches_the_single_endpoints():
+    results = post_batch([
+        {"dataset": "daily_data", "user_id": USER_ID, "date": "2016-04-12"},
+        {"dataset": "fitness_goals", "user_id": USER_ID, "key": "goals"},
+        {"dataset": "daily_data", "user_id": USER_ID, "start": "2016-04-12", "end": "2016-04-13", "key": "range"},
+    ]).json()["results"]
+
+    by_date = client.get("/data/daily_data/by-date", params={"user_id": USER_ID, "date": "2016-04-12"}).json()
+    next_day = client.get("/data/daily_data/by-date", params={"user_id": USER_ID, "date": "2016-04-13"}).json()
+    assert results[f"daily_data:{USER_ID}:2016-04-12"] == by_date
+    assert results["goals"] == client.get("/data/fitness_goals", params={"user_id": USER_ID}).json()
+    assert results["range"] == by_date + next_day
+
+
+def bump_steps(delta):
+    connection = create_connection(DATABASE_PATH)
+    try:
+        connection.execute("UPDATE daily_data SET totalsteps = totalsteps + ? WHERE id = ? AND date = ?",
+                           (delta, USER_ID, "2016-04-12"))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+class WritingCursor:
+    """Cursor that changes the data from another connection right after the first batch query."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.queries = 0
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query, params)
+        if query != "BEGIN":
+            self.queries += 1
+            if self.queries == 1:
+                bump_steps(1)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+class WritingConnection:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def cursor(self):
+        return WritingCursor(self.connection.cursor())
+
+    def rollback(self):
+        self.connection.rollback()
+
+
+def test_batch_reads_one_snapshot():
+    query = ("SELECT totalsteps FROM daily_data WHERE id = ? AND date = ?", (USER_ID, "2016-04-12"))
+    connection = create_connection(DATABASE_PATH)
+    try:
+        first, second = _fetch_batch(WritingConnection(connection), [query, query])
+        after = connection.execute(*query).fetchone()["totalsteps"]
+    finally:
+        connection.close()
+        bump_steps(-1)
+
+    assert first == second
+    assert after == first[0]["totalsteps"] + 1
+
+
+@pytest.mark.parametrize("queries, status", [
+    ([{"dataset": "conversation_messages", "user_id": USER_ID}], 404),
+    ([{"dataset": "daily_data", "user_id": USER_ID, "key": "a"}, {"dataset": "sleep_data", "user_id": USER_ID, "key": "a"}], 400),
+    ([{"dataset": "daily_data", "user_id": USER_ID}, {"dataset": "daily_data", "user_id": USER_ID}], 400),
+    ([{"dataset": "daily_data", "user_id": USER_ID, "day": "2016-04-12"}], 422),
+    ([{"dataset": "daily_data", "user_id": USER_ID, "start": "2016-04-12"}], 400),
+])
+def test_batch_rejects_invalid_queries(queries, status):
+    assert post_batch(queries).status_code == status
@@ -0,0 +1,33 @@
+"""Tests for the SQLite connection pool."""
+
+import threading
+from database import DATABASE_PATH, ConnectionPool
+
+
+def test_waiting_writers_hold_no_pool_slot():
+    pool = ConnectionPool(DATABASE_PATH, size=2, timeout=1)
+    writing, waiting, done = threading.Event(), threading.Event(), threading.Event()
+
+    def writer():
+        with pool.connection(write=True):
+            writing.set()
+            done.wait(5)
+
+    def second_writer():
+        waiting.set()
+        with pool.connection(write=True):
+            pass
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=second_writer)]
+    threads[0].start()
+    writing.wait(5)
+    threads[1].start()
+    waiting.wait(5)
+
+    # One slot is held by the active writer; the waiting writer must leave the other to readers
+    with pool.connection() as connection:
+        assert connection.execute("SELECT 1").fetchone()[0] == 1
+    done.set()
+    for thread in threads:
+        thread.join(5)
+    pool.close()
@@ -0,0 +1,79 @@
+"""Tests for the default detail type and the combined `types=all` detail."""
+
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import chatbot_endpoints_sql as chatbot
+from environment import USER_ID
+
+app = FastAPI()
+app.include_router(chatbot.router, prefix="/chat")
+client = TestClient(app)
+
+DATE = "2016-04-12"
+ALL_TYPES = [
+    {"type": "advice", "content": "Take a walk after lunch."},
+    {"type": "insight", "content": "You walk more on weekdays."},
+    {"type": "question", "content": "What kept you active on Tuesday?"},
+]
+
+
+class FakeGraph:
+    """Stands in for the generator workflow: records the requested types and returns a fixed answer."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.types = []
+
+    async def ainvoke(self, state):
+        self.types.append(state["random_type"])
+        return {"answer": json.dumps(self.answer)}
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    def install(answer):
+        graph = FakeGraph(answer)
+        monkeypatch.setattr(chatbot, "graph", graph)
+        return graph
+    return install
+
+
+def get_detail(metric, **params):
+    return client.get("/chat/detail", params={"date": DATE, "metric": metric, "user_id": USER_ID, **params}).json()
+
+
+def test_default_type_is_seeded_by_user_date_and_metric():
+    for metric in ["steps", "sleep", "calories"]:
+        assert chatbot.default_detail_type(USER_ID, DATE, metric) == chatbot.default_detail_type(USER_ID, DATE, metric)
+        assert chatbot.default_detail_type(USER_ID, DATE, metric) in chatbot.DETAIL_TYPES
+
+    chosen = {chatbot.default_detail_type(USER_ID, f"2016-04-{day:02d}", "steps") for day in range(1, 31)}
+    assert chosen == set(chatbot.DETAIL_TYPES)
+
+
+def test_detail_without_type_uses_the_default(fake_graph):
+    graph = fake_graph({"type": "insight", "content": "Nice."})
+
+    first = get_detail("default_type_test")
+    assert get_detail("default_type_test") == first
+    assert graph.types == [chatbot.default_detail_type(USER_ID, DATE, "default_type_test")]
+
+
+def test_all_types_returns_every_type_in_order(fake_graph):
+    graph = fake_graph(ALL_TYPES)
+
+    outputs = get_detail("all_types_test", types="all")["outputs"]
+    assert [output["type"] for output in outputs] == chatbot.DETAIL_TYPES
+    assert graph.types == ["all"]
+
+
+def test_all_types_missing_a_type_is_an_error(fake_graph):
+    fake_graph(ALL_TYPES[:2])
+    assert "error" in get_detail("missing_type_test", types="all")
+
+
+@pytest.mark.parametrize("params", [{"types": "some"}, {"random_type": "joke"}])
+def test_invalid_types_are_rejected(params):
+    assert "error" in get_detail("steps", **params)
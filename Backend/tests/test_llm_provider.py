@@ -0,0 +1,59 @@
+"""Tests for the local LLM backends: the stub and the recorded replay."""
+
+import json
+import httpx
+from llm_provider import (
+    LOCAL_BASE_URL, STUB_JSON_REPLY, STUB_REPLY, ReplayTransport, StubTransport, create_chat_model, request_key,
+)
+
+TOOLS = [
+    {"type": "function", "function": {"name": "needs_date", "parameters": {"type": "object", "required": ["date"]}}},
+    {"type": "function", "function": {"name": "list_tables", "parameters": {"type": "object"}}},
+]
+
+
+def post(transport, body):
+    with httpx.Client(transport=transport, base_url=LOCAL_BASE_URL) as client:
+        return client.post("/chat/completions", json=body)
+
+
+def test_stub_calls_the_first_tool_without_required_arguments():
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "How did I sleep?"}], "tools": TOOLS}
+    message = post(StubTransport(latency_ms=0), body).json()["choices"][0]["message"]
+    assert message["tool_calls"][0]["function"]["name"] == "list_tables"
+
+    body["messages"] += [message, {"role": "tool", "tool_call_id": message["tool_calls"][0]["id"], "content": "daily_data"}]
+    assert post(StubTransport(latency_ms=0), body).json()["choices"][0]["message"]["content"] == STUB_REPLY
+
+
+def test_stub_answers_json_prompts_with_json():
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Reply strictly in JSON"}]}
+    assert post(StubTransport(latency_ms=0), body).json()["choices"][0]["message"]["content"] == STUB_JSON_REPLY
+
+
+def test_stub_streams_server_sent_events():
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Hi"}], "stream": True}
+    response = post(StubTransport(latency_ms=0), body)
+    assert response.headers["content-type"] == "text/event-stream"
+    assert response.text.endswith("data: [DONE]\n\n")
+
+
+def test_chat_model_runs_on_the_stub():
+    assert create_chat_model().invoke("Hello").content == STUB_REPLY
+
+
+def test_replay_returns_recorded_responses_only(tmp_path):
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Recorded question"}]}
+    recorded = post(StubTransport(latency_ms=0), body)
+    request = httpx.Request("POST", f"{LOCAL_BASE_URL}/chat/completions", json=body)
+
+    recordings = tmp_path / "recordings.jsonl"
+    recordings.write_text(json.dumps({
+        "key": request_key(request), "status_code": 200,
+        "content_type": "application/json", "body": recorded.text,
+    }) + "\n", encoding="utf-8")
+    replay = ReplayTransport(path=str(recordings))
+
+    assert post(replay, body).json() == recorded.json()
+    missing = post(replay, dict(body, messages=[{"role": "user", "content": "Unrecorded question"}]))
+    assert missing.status_code == 400
@@ -0,0 +1,78 @@
+"""Tests for the typed metric tools, checked against plain SQL on the same database."""
+
+import pytest
+import metric_tools
+import sql_tool
+from database import pool
+from environment import USER_ID
+from metric_tools import compare_days, get_day_summary, hr_zones_for_day, sleep_stages_for_night, weekly_trend
+
+CONFIG = {"configurable": {"user_id": USER_ID}}
+DAY, NEXT_DAY = "2016-04-12", "2016-04-13"
+
+
+def scalar(query, *params):
+    with pool.connection() as connection:
+        return connection.execute(query, (USER_ID, *params)).fetchone()[0]
+
+
+def test_day_summary_matches_daily_data():
+    summary = get_day_summary.invoke({"date": DAY}, config=CONFIG)
+    assert summary["steps"] == scalar("SELECT totalsteps FROM daily_data WHERE id = ? AND date = ?", DAY)
+    assert summary["sleep_minutes"] == scalar("SELECT total_sleep_minutes FROM daily_data WHERE id = ? AND date = ?", DAY)
+    steps_goal = scalar("SELECT goal FROM fitness_goals WHERE id = ? AND metric = 'steps'")
+    assert summary["goals"]["steps"] == {"goal": steps_goal, "percent_reached": round(summary["steps"] / steps_goal * 100)}
+
+
+def test_compare_days_difference():
+    result = compare_days.invoke({"date_a": DAY, "date_b": NEXT_DAY}, config=CONFIG)
+    assert result["difference"]["steps"] == result["day_b"]["steps"] - result["day_a"]["steps"]
+    assert "goals" not in result["day_a"]
+
+
+def test_weekly_trend_is_oldest_first_with_changes():
+    weeks = weekly_trend.invoke({"end_date": NEXT_DAY, "weeks": 3}, config=CONFIG)["weeks"]
+    assert len(weeks) == 3
+    assert [week["week"] for week in weeks] == sorted(week["week"] for week in weeks)
+    assert weeks[-1]["week"].startswith("2016-04-11")
+    assert "change" not in weeks[0]
+    assert weeks[1]["change"]["steps"] == weeks[1]["steps"] - weeks[0]["steps"]
+
+
+def test_sleep_stages_cover_the_night():
+    night = sleep_stages_for_night.invoke({"night_date": DAY}, config=CONFIG)
+    minutes = scalar("SELECT COUNT(*) FROM minute_sleep WHERE id = ? AND timestamp >= ? AND timestamp < ?",
+                     f"{DAY} 12:00:00", f"{NEXT_DAY} 12:00:00")
+    assert night["minutes_in_bed"] == minutes
+    assert night["asleep_minutes"] + night["restless_minutes"] + night["awake_minutes"] == minutes
+    assert night["bedtime"] < night["wake_time"]
+
+
+def test_hr_zones_count_every_measured_minute():
+    zones = hr_zones_for_day.invoke({"date": DAY}, config=CONFIG)
+    measured = scalar("SELECT COUNT(*) FROM heartrate_minutes WHERE id = ? AND date = ? AND value > 0", DAY)
+    assert zones["minutes_measured"] == measured
+    assert sum(zones["minutes_per_zone"].values()) == measured
+    assert zones["min_heart_rate"] > 0
+
+
+@pytest.mark.parametrize("arguments, config, error", [
+    ({"date": "2020-01-01"}, CONFIG, "No data"),
+    ({"date": "12/04/2016"}, CONFIG, "Invalid date"),
+    ({"date": DAY}, {}, "No user"),
+    ({"date": DAY}, {"configurable": {"user_id": "x"}}, "Invalid user ID"),
+])
+def test_errors_are_returned_to_the_agent(arguments, config, error):
+    assert error in get_day_summary.invoke(arguments, config=config)["error"]
+
+
+def test_database_errors_are_returned_to_the_agent(monkeypatch):
+    monkeypatch.setattr(metric_tools, "DAY_SUMMARY_QUERY", "SELECT missing_column FROM daily_data WHERE id = ? AND date = ?")
+    assert "Database error" in get_day_summary.invoke({"date": DAY}, config=CONFIG)["error"]
+
+
+def test_slow_lookups_time_out(monkeypatch):
+    slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n WHERE ? AND ?"
+    monkeypatch.setattr(metric_tools, "DAY_SUMMARY_QUERY", slow)
+    monkeypatch.setattr(sql_tool, "QUERY_TIMEOUT_SECONDS", 0.1)
+    assert "took longer" in get_day_summary.invoke({"date": DAY}, config=CONFIG)["error"]
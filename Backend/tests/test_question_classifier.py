@@ -0,0 +1,58 @@
+"""
+Accuracy and latency of the local question classifier on questions users asked.
+
+`fixtures/classifier_questions.csv` holds the distinct user questions of
+`data/conversation_messages.csv`, labeled by hand:
+
+- data: the answer needs the user's own data
+- general: general knowledge is enough
+- ambiguous: follow-ups that depend on the conversation, or other languages; these must go to the LLM
+"""
+
+import csv
+import os
+import time
+import pytest
+from question_classifier import classify_locally
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "classifier_questions.csv")
+
+# Minimum share of local decisions that must be correct, and of clear questions decided locally
+MIN_ACCURACY = 0.95
+MIN_COVERAGE = 0.6
+
+# Maximum mean time per classification
+MAX_MEAN_LATENCY_MS = 1
+
+
+def load_questions():
+    with open(FIXTURE_PATH, newline="", encoding="utf-8") as file:
+        return [(row["question"], row["label"]) for row in csv.DictReader(file)]
+
+
+QUESTIONS = load_questions()
+EXPECTED = {"data": True, "general": False}
+
+
+def test_local_decisions_are_accurate():
+    clear = [(question, EXPECTED[label]) for question, label in QUESTIONS if label in EXPECTED]
+    decided = [(classify_locally(question), expected) for question, expected in clear]
+    decided = [(result, expected) for result, expected in decided if result is not None]
+
+    accuracy = sum(result == expected for result, expected in decided) / len(decided)
+    coverage = len(decided) / len(clear)
+    assert accuracy >= MIN_ACCURACY, f"accuracy {accuracy:.2f}"
+    assert coverage >= MIN_COVERAGE, f"coverage {coverage:.2f}"
+
+
+@pytest.mark.parametrize("question", [question for question, label in QUESTIONS if label == "ambiguous"])
+def test_ambiguous_questions_fall_back_to_the_llm(question):
+    assert classify_locally(question) is None
+
+
+def test_classification_is_fast():
+    start = time.perf_counter()
+    for question, _ in QUESTIONS:
+        classify_locally(question)
+    mean_ms = (time.perf_counter() - start) / len(QUESTIONS) * 1000
+    assert mean_ms < MAX_MEAN_LATENCY_MS, f"{mean_ms:.3f} ms per question"
@@ -0,0 +1,71 @@
+"""Tests for the persistent LLM response cache and its invalidation."""
+
+import pytest
+from database import DATABASE_PATH, create_connection, pool
+from data_endpoints import _write_goal
+from environment import USER_ID
+from response_cache import invalidate_user_responses, lookup_response, store_response
+
+DATE = "2016-04-12"
+PARAMS = {"date": DATE, "user_id": USER_ID}
+
+
+@pytest.fixture
+def steps_goal():
+    """The user's steps goal, restored after the test."""
+    with pool.connection() as connection:
+        goal = connection.execute("SELECT goal FROM fitness_goals WHERE id = ? AND metric = 'steps'", (USER_ID,)).fetchone()[0]
+    yield goal
+    with pool.connection(write=True) as connection:
+        _write_goal(connection, int(USER_ID), "steps", goal)
+
+
+def cache_entries():
+    with pool.connection() as connection:
+        return connection.execute("SELECT COUNT(*) FROM llm_response_cache WHERE user_id = ?", (USER_ID,)).fetchone()[0]
+
+
+def store(endpoint, response):
+    """Store `response` as the only cached response of the user."""
+    with pool.connection(write=True) as connection:
+        invalidate_user_responses(connection, USER_ID)
+        cache_key, cached = lookup_response(connection, endpoint, USER_ID, DATE, PARAMS)
+        assert cached is None
+        store_response(connection, cache_key, endpoint, USER_ID, response)
+        return cache_key
+
+
+def test_miss_then_hit_on_a_read_only_connection():
+    cache_key = store("test_hit", {"answer": 1})
+
+    connection = create_connection(DATABASE_PATH, read_only=True)
+    try:
+        assert lookup_response(connection, "test_hit", USER_ID, DATE, PARAMS) == (cache_key, {"answer": 1})
+        assert lookup_response(connection, "test_hit", USER_ID, DATE, {**PARAMS, "type": "other"})[1] is None
+        assert not connection.in_transaction
+    finally:
+        connection.close()
+
+
+def test_data_change_misses_and_invalidates(steps_goal):
+    store("test_invalidate", {"answer": 2})
+
+    with pool.connection(write=True) as connection:
+        _write_goal(connection, int(USER_ID), "steps", steps_goal + 1)
+
+    assert cache_entries() == 0
+    with pool.connection() as connection:
+        assert lookup_response(connection, "test_invalidate", USER_ID, DATE, PARAMS)[1] is None
+
+
+def test_invalidation_commits_with_the_data_change():
+    store("test_transaction", {"answer": 3})
+
+    with pool.connection(write=True) as connection:
+        connection.execute("UPDATE fitness_goals SET goal = goal WHERE id = ?", (USER_ID,))
+        invalidate_user_responses(connection, USER_ID)
+        # Other connections still see the old data and its cached response until the commit
+        assert cache_entries() == 1
+        connection.commit()
+
+    assert cache_entries() == 0
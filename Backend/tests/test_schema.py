@@ -0,0 +1,53 @@
+"""Tests for the schema migrations and the indexes used by the hot data queries."""
+
+import pytest
+from database import DATABASE_PATH, create_connection
+from environment import USER_ID
+from schema import MIGRATIONS, TABLES, migrate
+
+# Tables served by the by-date and week-back routes
+DATED_TABLES = [table for table, columns in TABLES.items() if "date" in dict(columns)]
+
+# Queries of the data routes, with their parameters
+HOT_QUERIES = {
+    "by-date": ("SELECT * FROM {table} WHERE id = ? AND date = ?", (USER_ID, "2016-04-12")),
+    "week-back": ("SELECT * FROM {table} WHERE id = ? AND date BETWEEN ? AND ? ORDER BY date",
+                  (USER_ID, "2016-04-06", "2016-04-12")),
+}
+
+
+def query_plan(query, params):
+    connection = create_connection(DATABASE_PATH)
+    try:
+        return [row["detail"] for row in connection.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    finally:
+        connection.close()
+
+
+def assert_index_lookup(plan):
+    assert any("USING" in step and "INDEX idx_" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") or "TEMP B-TREE" in step for step in plan), plan
+
+
+def test_migrate_is_idempotent():
+    assert migrate() == len(MIGRATIONS)
+    assert migrate() == len(MIGRATIONS)
+
+
+@pytest.mark.parametrize("route", HOT_QUERIES)
+@pytest.mark.parametrize("table", DATED_TABLES)
+def test_hot_queries_use_indexes(route, table):
+    query, params = HOT_QUERIES[route]
+    assert_index_lookup(query_plan(query.format(table=table), params))
+
+
+def test_minute_heart_rate_uses_covering_index():
+    plan = query_plan(
+        "SELECT CAST(strftime('%s', minute) AS INTEGER) AS epoch, value FROM heartrate_minutes "
+        "WHERE id = ? AND date = ? ORDER BY minute", (USER_ID, "2016-04-12"))
+    assert_index_lookup(plan)
+    assert any("COVERING INDEX" in step for step in plan), plan
+
+
+def test_goals_use_index():
+    assert_index_lookup(query_plan("SELECT * FROM fitness_goals WHERE id = ? AND metric = ?", (USER_ID, "steps")))
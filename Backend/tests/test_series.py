@@ -0,0 +1,68 @@
+"""Tests for the binary series format and its content negotiation."""
+
+from array import array
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_endpoints import router
+from database import DATABASE_PATH, create_connection
+from environment import USER_ID
+from series import HEADER, MAGIC, MAX_VALUE, MEDIA_TYPE, MISSING, pack_series
+
+app = FastAPI()
+app.include_router(router, prefix="/data")
+client = TestClient(app)
+
+DATE = "2016-05-08"
+DAY_START = 1462665600  # 2016-05-08T00:00:00Z
+
+
+def unpack(payload):
+    magic, start, step, count = HEADER.unpack_from(payload)
+    values = array("h")
+    values.frombytes(payload[HEADER.size:])
+    assert magic == MAGIC and len(values) == count
+    return start, step, values.tolist()
+
+
+def test_pack_round_trips_header_and_values():
+    rows = [(DAY_START + 60, 70), (DAY_START + 120, 72), (DAY_START + 300, 80)]
+    assert unpack(pack_series(rows, start=DAY_START)) == (DAY_START, 60, [MISSING, 70, 72, MISSING, MISSING, 80])
+    assert unpack(pack_series(rows))[0] == DAY_START + 60
+
+
+def test_pack_marks_zero_and_null_as_missing():
+    rows = [(DAY_START, 0), (DAY_START + 60, None), (DAY_START + 120, 65)]
+    assert unpack(pack_series(rows, start=DAY_START))[2] == [MISSING, MISSING, 65]
+
+
+@pytest.mark.parametrize("value", [-5, MAX_VALUE + 1])
+def test_pack_rejects_values_outside_the_range(value):
+    with pytest.raises(ValueError):
+        pack_series([(DAY_START, value)])
+
+
+def test_by_date_negotiates_the_series_format():
+    params = {"user_id": USER_ID, "date": DATE}
+    assert isinstance(client.get("/data/heartrate_minutes/by-date", params=params).json(), list)
+
+    response = client.get("/data/heartrate_minutes/by-date", params=params, headers={"Accept": MEDIA_TYPE})
+    assert response.headers["content-type"] == MEDIA_TYPE
+    start, step, values = unpack(response.content)
+
+    connection = create_connection(DATABASE_PATH)
+    try:
+        rows = connection.execute(
+            "SELECT minute, value FROM heartrate_minutes WHERE id = ? AND date = ? ORDER BY minute", (USER_ID, DATE)).fetchall()
+    finally:
+        connection.close()
+    assert (start, step, len(values)) == (DAY_START, 60, len(rows))
+    assert values == [row["value"] or MISSING for row in rows]
+
+
+def test_minute_route_negotiates_the_series_format():
+    response = client.get("/data/heartrate/minute", params={"user_id": USER_ID, "bydate": DATE, "resolution": "hourly"},
+                          headers={"Accept": MEDIA_TYPE})
+    start, step, values = unpack(response.content)
+    assert (start, step) == (DAY_START, 3600)
+    assert MISSING not in values[:18]
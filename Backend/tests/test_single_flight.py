@@ -0,0 +1,80 @@
+"""Tests for the coalescing of identical in-flight generations."""
+
+import asyncio
+import pytest
+from single_flight import SingleFlight
+
+CALLERS = 10
+
+
+class Generation:
+    """Counts its runs and finishes when released, with a result or an error."""
+
+    def __init__(self, error=None):
+        self.runs = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return f"result {self.runs}"
+
+
+async def run_concurrently(flight, generation):
+    callers = [asyncio.ensure_future(flight.run("key", generation)) for _ in range(CALLERS)]
+    await asyncio.sleep(0)
+    assert flight.stats()["in_flight"] == 1
+    generation.release.set()
+    return await asyncio.gather(*callers, return_exceptions=True)
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        flight, generation = SingleFlight(), Generation()
+        results = await run_concurrently(flight, generation)
+
+        assert generation.runs == 1
+        assert results == ["result 1"] * CALLERS
+        assert flight.stats() == {"started": 1, "coalesced": CALLERS - 1, "in_flight": 0}
+
+        # Once finished, the next call starts a new run
+        assert await flight.run("key", generation) == "result 2"
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_caller_and_releases_the_key():
+    async def scenario():
+        flight, failing = SingleFlight(), Generation(error=RuntimeError("generation failed"))
+        results = await run_concurrently(flight, failing)
+
+        assert failing.runs == 1
+        assert len(results) == CALLERS
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.stats()["in_flight"] == 0
+
+        # The failure is not cached: the next call runs again
+        generation = Generation()
+        generation.release.set()
+        assert await flight.run("key", generation) == "result 1"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight, generation = SingleFlight(), Generation()
+        first = asyncio.ensure_future(flight.run("key", generation))
+        second = asyncio.ensure_future(flight.run("key", generation))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        generation.release.set()
+        assert await second == "result 1"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
@@ -0,0 +1,113 @@
+"""Tests for the user scoping and the guards of the agent's SQL tool."""
+
+import ast
+import pytest
+from database import pool
+from environment import USER_ID
+from metric_tools import get_day_summary
+from sql_tool import run_query, sql_db_query
+
+# A second user, whose rows must never reach the first one's queries
+OTHER_USER_ID = "1111111111"
+DATE = "2016-04-12"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def other_user():
+    with pool.connection(write=True) as connection:
+        connection.execute("INSERT INTO daily_data (id, date, totalsteps) VALUES (?, ?, ?)", (OTHER_USER_ID, DATE, 99999))
+        connection.execute("INSERT INTO sleep_data (id, date, asleep_minutes) VALUES (?, ?, ?)", (OTHER_USER_ID, DATE, 999))
+        connection.commit()
+    yield
+    with pool.connection(write=True) as connection:
+        connection.execute("DELETE FROM daily_data WHERE id = ?", (OTHER_USER_ID,))
+        connection.execute("DELETE FROM sleep_data WHERE id = ?", (OTHER_USER_ID,))
+        connection.commit()
+
+
+def rows(query, user_id=USER_ID):
+    result = run_query(query, user_id)
+    assert not result.startswith("Error"), result
+    return ast.literal_eval(result)
+
+
+def test_query_sees_own_rows():
+    assert rows(f"SELECT totalsteps FROM daily_data WHERE date = '{DATE}'") != [(99999,)]
+    assert rows(f"SELECT totalsteps FROM daily_data WHERE date = '{DATE}'", OTHER_USER_ID) == [(99999,)]
+
+
+def test_or_condition_does_not_leak():
+    query = f"SELECT DISTINCT id FROM daily_data WHERE id = {OTHER_USER_ID} OR 1 = 1"
+    assert rows(query) == [(int(USER_ID),)]
+
+
+def test_union_does_not_leak():
+    query = (f"SELECT id, date FROM daily_data WHERE id = {USER_ID} AND date = '{DATE}' "
+             f"UNION ALL SELECT id, date FROM sleep_data WHERE id = {OTHER_USER_ID}")
+    assert rows(query) == [(int(USER_ID), DATE)]
+
+
+def test_unfiltered_join_does_not_leak():
+    query = (f"SELECT DISTINCT d.id, s.id FROM daily_data d JOIN sleep_data s ON s.date = d.date "
+             f"WHERE d.date = '{DATE}'")
+    assert rows(query) == [(int(USER_ID), int(USER_ID))]
+
+
+def test_subquery_does_not_leak():
+    query = f"SELECT COUNT(*) FROM daily_data WHERE id IN (SELECT id FROM sleep_data WHERE id <> {USER_ID})"
+    assert rows(query) == [(0,)]
+
+
+@pytest.mark.parametrize("query", [
+    f"WITH days AS (SELECT date FROM daily_data WHERE date <= '{DATE}') SELECT COUNT(*) > 0 FROM days",
+    f"SELECT COUNT(*) > 0 FROM (SELECT date FROM sleep_data WHERE date <= '{DATE}')",
+])
+def test_counts_over_ctes_and_subqueries(query):
+    assert rows(query) == [(1,)]
+
+
+def test_ctes_cannot_read_other_users():
+    query = f"WITH everyone AS (SELECT id FROM daily_data WHERE id = {OTHER_USER_ID} OR 1 = 1) SELECT COUNT(*) FROM everyone WHERE id = {OTHER_USER_ID}"
+    assert rows(query) == [(0,)]
+
+
+@pytest.mark.parametrize("query", [
+    "WITH everyone AS (SELECT id FROM main.daily_data) SELECT COUNT(*) FROM everyone",
+    f"SELECT totalsteps FROM main.daily_data WHERE id = {OTHER_USER_ID}",
+    "SELECT name FROM sqlite_master",
+    "SELECT * FROM conversation_messages",
+    "DELETE FROM daily_data",
+    "DROP VIEW daily_data",
+    "CREATE TEMP VIEW everyone AS SELECT * FROM main.daily_data",
+    "PRAGMA table_info(daily_data)",
+])
+def test_other_tables_and_statements_are_rejected(query):
+    assert run_query(query, USER_ID).startswith("Error"), query
+
+
+def test_views_survive_rejected_queries():
+    run_query("DROP VIEW daily_data", USER_ID)
+    assert rows(f"SELECT DISTINCT id FROM daily_data WHERE id = {OTHER_USER_ID} OR 1 = 1") == [(int(USER_ID),)]
+
+
+def test_tool_takes_user_from_config():
+    config = {"configurable": {"user_id": OTHER_USER_ID}}
+    result = sql_db_query.invoke({"query": "SELECT DISTINCT id FROM daily_data"}, config=config)
+    assert ast.literal_eval(result) == [(int(OTHER_USER_ID),)]
+    result = sql_db_query.invoke({"query": "SELECT 1"}, config={"configurable": {"user_id": "1 OR 1 = 1"}})
+    assert result.startswith("Error")
+
+
+def test_metric_tools_are_scoped():
+    summary = get_day_summary.invoke({"date": DATE}, config={"configurable": {"user_id": OTHER_USER_ID}})
+    assert summary["steps"] == 99999
+    summary = get_day_summary.invoke({"date": DATE}, config={"configurable": {"user_id": USER_ID}})
+    assert summary["steps"] != 99999
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT AVG(value) FROM heartrate_minutes",
+    "SELECT AVG(h.value) FROM heartrate_minutes h",
+])
+def test_full_scans_of_large_tables_are_rejected(query):
+    assert "reads all" in run_query(query, USER_ID)